@@ -0,0 +1,205 @@
+import sys, os, pathlib, json, time, platform, tempfile, importlib
+import contextlib, cProfile
+import multiprocessing
+try:
+    import resource
+except ImportError: # Not available on Windows
+    resource = None
+
+import cv2
+import numpy as np
+
+from benchmark_cli.benchmark_options import init_argparse
+from benchmark_cli.startup import run_startup_benchmark
+from benchmark_cli.synthetic import generate_video
+
+class BenchmarkException(Exception):
+    pass
+
+def run_benchmarks(output_file, width=640, height=480, frame_count=300, fps=30,
+                   noise=2.0, radius=15, workdir=None, profile=False):
+    '''Generates a synthetic video and times every processing stage on it.
+    Each stage runs in a fresh process so its peak memory is measured on
+    its own.
+
+    Parameters:
+        output_file(Path): JSON file the results are written to.
+        workdir(Path): Directory for the video and intermediate files,
+            a temporary directory if None.
+        profile(bool): Save a cProfile dump of each stage to the workdir.
+
+    Return:
+        dict: The results written to output_file.
+    '''
+    with contextlib.ExitStack() as stack:
+        if workdir is None:
+            workdir = stack.enter_context(tempfile.TemporaryDirectory())
+        workdir = pathlib.Path(workdir).resolve()
+        frames_dir = workdir / "frames"
+        mask_dir = workdir / "mask"
+        frames_dir.mkdir(parents=True, exist_ok=True)
+        mask_dir.mkdir(parents=True, exist_ok=True)
+        video_path = workdir / "synthetic.mp4"
+        trajectory = generate_video(video_path, width, height, frame_count,
+                                    fps, noise, radius)
+
+        def stage(name, module, function, *args, frames=frame_count, **kwargs):
+            profile_path = workdir / f"{name}.prof" if profile else None
+            result = run_stage(module, function, args, kwargs, profile_path)
+            result["frames_per_second"] = frames / result["seconds"]
+            stages[name] = result
+            print(f"{name}: {result['seconds']:.3f} s, "
+                  f"{result['frames_per_second']:.1f} frames/s, "
+                  f"peak RSS {result['peak_rss_mb']} MB", flush=True)
+            return result["return_value"]
+
+        stages = {}
+        fps_read, frame_delta_t = stage(
+            "extract_frame", "extract_frame_cli.extract_frame",
+            "extract_frame", video_path, frames_dir, 1, True, cache=False)
+
+        # Region covering the ball in the two frames that are compared
+        corners = np.concatenate([trajectory[2] - radius,
+                                  trajectory[4] + radius,
+                                  trajectory[2] + radius,
+                                  trajectory[4] - radius]).reshape(-1, 2)
+        x1, y1 = np.clip(corners.min(axis=0), 0, None).astype(int)
+        x2, y2 = corners.max(axis=0).astype(int)
+        threshold = stage("calculate_threshold", "thresholding_cli.thresholding",
+                          "calculate_threshold", frames_dir / "00002.jpg",
+                          frames_dir / "00004.jpg", (x1, x2), (y1, y2),
+                          frames=2)
+
+        stage("combine_images", "combine_images_cli.combine_images",
+              "combine_images", frames_dir, mask_dir, threshold, True,
+              cache=False)
+        region = (0, 0, width, height)
+        stage("detect_blobs", "blob_detection_cli.blob_detection",
+              "detect_blobs", mask_dir / "mask.png", mask_dir, region,
+              frames=1)
+        stage("get_positions", "get_positions_cli.get_positions",
+              "get_positions", frames_dir, frame_delta_t, region, 1.0,
+              cache=False)
+
+        csv_path = frames_dir / "data" / "position_data.csv"
+        data = np.genfromtxt(csv_path, delimiter=",", names=True)
+        stage("kinematics", "benchmark_cli.stages", "calculate_kinematics",
+              csv_path, frames=max(len(data), 1))
+
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "video": {"width": width, "height": height, "frames": frame_count,
+                  "fps": fps, "noise": noise, "radius": radius},
+        "detected_fraction": len(data) / frame_count,
+        "position_error_px": position_error(data, trajectory, height),
+        "stages": {name: {key: value for key, value in result.items()
+                          if key != "return_value"}
+                   for name, result in stages.items()},
+    }
+    with open(output_file, "w") as json_file:
+        json.dump(results, json_file, indent=2)
+    return results
+
+def run_stage(module, function, args, kwargs, profile_path=None):
+    '''Runs module.function(*args, **kwargs) in a new process.
+
+    Return:
+        dict: seconds, peak_rss_mb and the return_value of the function.
+    '''
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_stage_worker,
+                              args=(module, function, args, kwargs, 
+                                    profile_path, sender))
+    process.start()
+    sender.close()
+    try:
+        result = receiver.recv()
+    except EOFError:
+        result = {"error": f"{function} exited with code {process.exitcode}"}
+    process.join()
+    if "error" in result:
+        raise BenchmarkException(result["error"])
+    return result
+
+def _stage_worker(module, function, args, kwargs, profile_path, sender):
+    reset_peak_rss()
+    try:
+        # Imports are not part of the timing
+        stage_function = getattr(importlib.import_module(module), function)
+        profiler = cProfile.Profile() if profile_path else None
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            if profiler is not None:
+                profiler.enable()
+            start = time.perf_counter()
+            return_value = stage_function(*args, **kwargs)
+            seconds = time.perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(str(profile_path))
+        sender.send({"seconds": seconds, "peak_rss_mb": peak_rss_mb(),
+                     "return_value": return_value})
+    except Exception as err:
+        sender.send({"error": f"{function}: {err}"})
+    finally:
+        sender.close()
+
+def reset_peak_rss():
+    '''Resets this process's peak memory on Linux. A spawned process
+    otherwise inherits its parent's peak through exec, so every stage
+    would report at least the parent's memory.'''
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        pass
+
+def peak_rss_mb():
+    try:
+        # Peak since reset_peak_rss, in kilobytes
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    if sys.platform == "darwin":
+        return round(peak / 1024 / 1024, 1)
+    return round(peak / 1024, 1)
+
+def position_error(data, trajectory, height):
+    '''Mean distance in pixels from each detected position to the closest
+    point of the true trajectory.'''
+    if len(data) == 0:
+        return None
+    detected = np.column_stack([data["x"], height - data["y"]])
+    distances = np.linalg.norm(detected[:, None, :] - trajectory[None, :, :],
+                               axis=2)
+    return float(distances.min(axis=1).mean())
+
+def main(argv=None, prog=None) -> None:
+    parser = init_argparse(prog)
+    args = parser.parse_args(argv)
+    if args.profile and args.workdir is None:
+        parser.error("--profile needs --workdir to keep the profiles.")
+    try:
+        if args.startup:
+            results = run_startup_benchmark(args.outfile, args.runs)
+            exit(0 if results["within_budget"] else 1)
+        run_benchmarks(args.outfile, args.width, args.height, args.frames,
+                       args.fps, args.noise, args.radius, args.workdir,
+                       args.profile)
+        exit(0)
+    except Exception as err:
+        print(err, file=sys.stderr)
+        exit(1)
+
+if __name__ == "__main__":
+    main()
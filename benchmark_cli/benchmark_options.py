@@ -0,0 +1,46 @@
+import sys, argparse, pathlib
+
+from benchmark_cli.startup import STARTUP_RUNS
+
+# The command line options of benchmark. Kept free of cv2 and numpy, so
+# phystracker can print help and reject bad arguments before importing the
+# stage.
+
+def init_argparse(prog=None) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog=prog or sys.argv[0],
+        usage="%(prog)s [-h] [-v] -o OUTPUT_FILE [--width W] [--height H] [--frames N] [--fps FPS] [--noise SIGMA] [--profile] [--startup [--runs N]]",
+        add_help=False,
+        description="Times every processing stage on a synthetic bouncing ball video"
+    )
+
+    required = parser.add_argument_group('required arguments')
+    required.add_argument("-o", "--outfile", action="store", type=pathlib.Path,
+                          required=True, help = "JSON file to write the results to")
+
+    optional = parser.add_argument_group('optional arguments')
+    optional.add_argument("-h", "--help", action="help",
+                          help="show this help message and exit")
+    optional.add_argument("-v", "--version", action="version",
+                        version=f"{parser.prog} version 1.0.0")
+    optional.add_argument("--width", action="store", type=int, default=640,
+                          help = "Width of the video in pixels")
+    optional.add_argument("--height", action="store", type=int, default=480,
+                          help = "Height of the video in pixels")
+    optional.add_argument("--frames", action="store", type=int, default=300,
+                          help = "Number of frames in the video")
+    optional.add_argument("--fps", action="store", type=float, default=30,
+                          help = "Frame rate of the video")
+    optional.add_argument("--noise", action="store", type=float, default=2.0,
+                          help = "Standard deviation of the noise added to frames")
+    optional.add_argument("--radius", action="store", type=int, default=15,
+                          help = "Radius of the ball in pixels")
+    optional.add_argument("--workdir", action="store", type=pathlib.Path,
+                          help = "Keep the video and intermediate files in this directory")
+    optional.add_argument("--profile", action="store_true",
+                          help = "Save a cProfile dump of each stage to the workdir")
+    optional.add_argument("--startup", action="store_true",
+                          help = """Only time how long the phystracker command takes to \
+                          start, failing if --help, --version or a command's --help is over budget""")
+    optional.add_argument("--runs", action="store", type=int, default=STARTUP_RUNS,
+                          help = "Times each command is started with --startup")
+    return parser
@@ -0,0 +1,9 @@
+import numpy as np
+from generate_graph_cli.generate_graph import read_csv
+from generate_graph_cli.kinematics import derivatives
+
+def calculate_kinematics(csv_path):
+    '''Velocity and acceleration of both coordinates, as the graph tool
+    computes them.'''
+    times, x_coords, y_coords = read_csv(csv_path)
+    derivatives(times, np.stack([x_coords, y_coords]))
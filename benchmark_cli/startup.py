@@ -0,0 +1,77 @@
+import sys, os, json, time, statistics, subprocess
+
+from phystracker_cli.phystracker import COMMANDS
+
+# Longest phystracker --help, --version and COMMAND --help may take,
+# interpreter startup included. The bare interpreter is timed too, to tell a slow machine
+# from a slow import.
+STARTUP_BUDGET_MS = 100
+STARTUP_RUNS = 10
+# Imports that must wait until a command runs
+HEAVY_MODULES = ("cv2", "numpy", "PIL", "matplotlib", "tabulate", "pandas")
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run_startup_benchmark(output_file, runs=STARTUP_RUNS):
+    '''Times how long phystracker takes to start for --help, --version and
+    the --help of every command, and checks each of them against
+    STARTUP_BUDGET_MS without importing any of HEAVY_MODULES.
+
+    Parameters:
+        output_file(Path): JSON file the results are written to.
+        runs(int): Times each command is run, the median is reported.
+
+    Return:
+        dict: The results written to output_file.
+    '''
+    python_ms = time_command(["-c", "pass"], runs)
+    print(f"python: {python_ms:.1f} ms", flush=True)
+    commands = {}
+    for arguments in [["--help"], ["--version"]] + [[name, "--help"] 
+                                                    for name in COMMANDS]:
+        command = ["-m", "phystracker_cli", *arguments]
+        milliseconds = time_command(command, runs)
+        result = {"ms": milliseconds, "overhead_ms": milliseconds - python_ms,
+                  "heavy_imports": heavy_imports(command)}
+        result["within_budget"] = (milliseconds <= STARTUP_BUDGET_MS
+                                   and not result["heavy_imports"])
+        name = " ".join(["phystracker", *arguments])
+        commands[name] = result
+        print(f"{name}: {milliseconds:.1f} ms "
+              f"(+{result['overhead_ms']:.1f} ms over python)"
+              + (f", imports {', '.join(result['heavy_imports'])}"
+                 if result["heavy_imports"] else "")
+              + ("" if result["within_budget"] else ", OVER BUDGET"),
+              flush=True)
+
+    results = {"python": sys.version.split()[0], "runs": runs,
+               "budget_ms": STARTUP_BUDGET_MS, "python_ms": python_ms,
+               "commands": commands,
+               "within_budget": all(result["within_budget"]
+                                    for result in commands.values())}
+    with open(output_file, "w") as json_file:
+        json.dump(results, json_file, indent=2)
+    return results
+
+def time_command(arguments, runs):
+    '''Median wall time in milliseconds of running the interpreter with
+    arguments.'''
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *arguments], cwd=REPO_PATH,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                       check=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+def heavy_imports(arguments):
+    '''HEAVY_MODULES imported while running the interpreter with
+    arguments, read from -X importtime.'''
+    process = subprocess.run([sys.executable, "-X", "importtime", *arguments],
+                             cwd=REPO_PATH, stdout=subprocess.DEVNULL,
+                             stderr=subprocess.PIPE, text=True)
+    imported = set()
+    for line in process.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            imported.add(line.rsplit("|", 1)[1].strip().split(".")[0])
+    return [module for module in HEAVY_MODULES if module in imported]
@@ -0,0 +1,64 @@
+import cv2
+import numpy as np
+
+def ball_trajectory(width, height, frame_count, radius, gravity=0.5, seed=0):
+    '''Simulates a ball thrown across the frame that bounces off the walls
+    and floor.
+
+    Return:
+        ndarray: (frame_count, 2) array of the ball centre in pixels.
+    '''
+    rng = np.random.default_rng(seed)
+    x, y = radius * 2.0, height / 3
+    vx = width / max(frame_count, 1) * rng.uniform(1.5, 3.0)
+    vy = -rng.uniform(0.0, 0.02) * height
+    positions = np.empty((frame_count, 2))
+    for i in range(frame_count):
+        positions[i] = x, y
+        vy += gravity
+        x += vx
+        y += vy
+        if not radius <= x <= width - radius:
+            vx = -vx
+            x = min(max(x, radius), width - radius)
+        if y > height - radius:
+            vy = -abs(vy)
+            y = height - radius
+    return positions
+
+def generate_video(path, width=640, height=480, frame_count=300, fps=30,
+                   noise=2.0, radius=15, seed=0):
+    '''Writes an mp4 of a white ball bouncing in front of a textured
+    background.
+
+    Parameters:
+        path(str): Output mp4 file.
+        noise(float): Standard deviation of the per-pixel noise added to
+            every frame.
+
+    Return:
+        ndarray: Trajectory of the ball centre, see ball_trajectory.
+    '''
+    rng = np.random.default_rng(seed)
+    trajectory = ball_trajectory(width, height, frame_count, radius,
+                                 seed=seed)
+    texture = rng.integers(40, 110, (height // 8 + 1, width // 8 + 1, 3),
+                           dtype=np.uint8)
+    background = cv2.resize(texture, (width, height),
+                            interpolation=cv2.INTER_LINEAR)
+
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"),
+                             fps, (width, height))
+    if not writer.isOpened():
+        raise IOError(f"Unable to write video to {path}.")
+    frame = np.empty_like(background)
+    for x, y in trajectory:
+        np.copyto(frame, background)
+        cv2.circle(frame, (int(round(x)), int(round(y))), radius,
+                   (255, 255, 255), -1, lineType=cv2.LINE_AA)
+        if noise > 0:
+            frame = np.clip(frame + rng.normal(0, noise, frame.shape),
+                            0, 255).astype(np.uint8)
+        writer.write(frame)
+    writer.release()
+    return trajectory
@@ -0,0 +1,41 @@
+import sys, argparse, pathlib
+
+from phystracker_cli.events import PROGRESS_FORMATS
+
+# The command line options of blob_detection. Kept free of cv2 and numpy, so
+# phystracker can print help and reject bad arguments before importing the
+# stage.
+
+# "blob" is cv2.SimpleBlobDetector, "components" is ComponentDetector
+DETECTORS = ("blob", "components")
+
+def tuple_type(strings):
+    strings = strings.replace("(", "").replace(")", "")
+    mapped_int = map(int, strings.split(","))
+    return tuple(mapped_int)
+
+def init_argparse(prog=None) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog=prog or sys.argv[0],
+        usage="%(prog)s [-h] [-v] -i INPUT_PATH -o OUTPUT_PATH -r ROI [--detector TYPE] [--progress FORMAT]", add_help=False, 
+        description="Detect blobs of an image and output image of blobs circled."
+    )
+
+    required = parser.add_argument_group('required arguments')
+    required.add_argument("-i", "--infile", action="store", type=pathlib.Path,
+                          required=True, help = "Full path to compacted frames file")
+    required.add_argument("-o", "--outdir", action="store", type=pathlib.Path,
+                          required=True, help = "Full path to output directory")
+    required.add_argument("-r", "--region", action="store", type=tuple_type,
+                          required=True, help = "Region where the path is in form: (x, y, w, h)")
+
+    optional = parser.add_argument_group('optional arguments')
+    optional.add_argument("-h", "--help", action="help", 
+                          help="show this help message and exit")
+    optional.add_argument("-v", "--version", action="version", 
+                        version=f"{parser.prog} version 1.0.0")
+    optional.add_argument("--detector", choices=DETECTORS, default="blob",
+                          help = """Blob detector: OpenCV's SimpleBlobDetector or \
+                          a faster connected components detector""")
+    optional.add_argument("--progress", choices=PROGRESS_FORMATS, default="text",
+                          help = "Print progress as text or as one JSON event per line")
+    return parser
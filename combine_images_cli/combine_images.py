@@ -1,22 +1,103 @@
-import sys, os
-import argparse
-import pathlib
+import os
 import cv2
+import numpy as np
 from PIL import Image
 
-def combine_images(input_path, output_path, threshold, force_flag, queue):
+from combine_images_cli.combine_images_options import init_argparse
+from extract_frame_cli.frame_store import FrameStore, open_frames
+from phystracker_cli.cache import (CACHE_FILE, cached_result, invalidate, 
+                                   record_outputs, stage_key, upstream_key)
+from phystracker_cli.events import ProgressReporter, report_failure
+
+# Weights (in 1/32768 units, B, G, R order) libpng uses when OpenCV decodes
+# a colour PNG as grayscale. The legacy path went through that decode, so the
+# in-memory engine applies the same integer conversion to stay bit-identical.
+PNG_GRAY_WEIGHTS = (3737, 19234, 9797)
+
+class MaskAccumulator:
+    """Builds the combined mask one frame at a time with whole-array
+    operations. Only the previous frame and the running mask are held in
+    memory.
+
+    Parameters:
+        threshold(int): Difference above which a pixel is marked as moving.
+    """
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.previous = None
+        self.mask = None
+        self.count = 0
+
+    def add_frame(self, frame):
+        if self.previous is not None:
+            self.add_difference(frame_difference(self.previous, frame))
+        self.previous = frame
+
+    def add_difference(self, difference):
+        if self.mask is None:
+            self.mask = difference.copy()
+            self._sum = np.empty(difference.shape, dtype=np.uint16)
+        changed = cv2.absdiff(self.mask, difference) > self.threshold
+        np.add(self.mask, difference, out=self._sum, dtype=np.uint16)
+        np.right_shift(self._sum, 1, out=self._sum)
+        np.copyto(self.mask, self._sum, casting="unsafe")
+        self.mask[changed] = 255
+        self.count += 1
+
+    def result(self):
+        if self.mask is None:
+            raise IOError("At least two frames are needed to build a mask")
+        return np.where(self.mask == 255, 255, 0).astype(np.uint8)
+
+def frame_difference(img1, img2):
+    return to_gray(cv2.absdiff(img1, img2))
+
+def to_gray(image):
+    if image.ndim == 2:
+        return image
+    gray = image[..., 0].astype(np.uint32) * PNG_GRAY_WEIGHTS[0]
+    gray += image[..., 1].astype(np.uint32) * PNG_GRAY_WEIGHTS[1]
+    gray += image[..., 2].astype(np.uint32) * PNG_GRAY_WEIGHTS[2]
+    gray >>= 15
+    return gray.astype(np.uint8)
+
+def combine_images(input_path, output_path, threshold, force_flag=False, 
+                   queue=None, legacy=False, progress="text", cache=True,
+                   gray=False):
     """Takes frames and computes difference between them, and 
     combines these differences into one image.
 
     Parameters:
-        video_path(str): Path to frames.
-        output_path(str): Path to dir to output difference frames.       
+        video_path(str): Path to frames or a frame store.
+        output_path(str): Path to dir to output the mask.
+        threshold(int): Threshold value calculated by threshold tool.
+        legacy(bool): Use the original per-pixel implementation that
+            writes intermediate difference images.
+        progress(str): Progress printed to stdout, see ProgressReporter.
+        cache(bool): Reuse mask.png when it was made from the same frames
+            and threshold, see phystracker_cli.cache.
+        gray(bool): Read frames as single channel images and diff those.
     """
     input_abs_path = input_path.resolve()
     output_abs_path = output_path.resolve()
 
-    img_files = os.listdir(input_abs_path)
-    if len(img_files) < 1:
+    reporter = ProgressReporter("combine_images", queue, progress)
+    key = None
+    frames_key = upstream_key(input_abs_path, "extract_frame")
+    if cache and frames_key is not None:
+        key = stage_key("combine_images", 
+                        {"threshold": threshold, "legacy": legacy, 
+                         "gray": gray}, 
+                        [frames_key])
+        result = cached_result(output_abs_path, "combine_images", key)
+        if result is not None:
+            reporter.start()
+            reporter.finish(cached=True, **result)
+            return
+
+    # Frames are listed by extract_frame's manifest or frame store
+    frames = open_frames(input_abs_path, gray=gray)
+    if len(frames) < 1:
         raise IOError("Frames folder is empty")
         
     if os.path.exists(output_abs_path):
@@ -25,7 +106,35 @@ def combine_images(input_path, output_path, threshold, force_flag, queue):
                 raise IOError(f"Files already exist in {output_abs_path}.")
     else:
         raise FileNotFoundError(f"{output_abs_path} does not exist.")
+    invalidate(output_abs_path, "combine_images")
+
+    if legacy:
+        if isinstance(frames, FrameStore):
+            raise ValueError("--legacy only reads frames saved as images.")
+        if gray:
+            raise ValueError("--legacy can't be combined with --gray.")
+        result = _combine_images_legacy(input_abs_path, output_abs_path, 
+                                        threshold, reporter)
+    else:
+        reporter.start(len(frames))
+        accumulator = MaskAccumulator(threshold)
+        for i, frame in enumerate(frames):
+            accumulator.add_frame(frame)
+            reporter.update(i + 1)
+
+        mask_path = f"{output_abs_path}{os.sep}mask.png"
+        cv2.imwrite(mask_path, accumulator.result())
+        result = {"mask": mask_path, "frames": len(frames)}
+
+    if key is not None:
+        record_outputs(output_abs_path, "combine_images", key, ["mask.png"], 
+                       result)
+    reporter.finish(**result)
 
+def _combine_images_legacy(input_abs_path, output_abs_path, threshold, 
+                           reporter):
+    img_files = [filename for filename in sorted(os.listdir(input_abs_path))
+                 if not filename.startswith(CACHE_FILE)]
     for i in range(0, len(img_files)-1):
         if img_files[i+1] == "average.jpg":
             break
@@ -37,7 +146,9 @@ def combine_images(input_path, output_path, threshold, force_flag, queue):
         cv2.imwrite(f"{output_abs_path}{os.sep}diff{i}.png", difference)
 
     img = cv2.imread(f"{output_abs_path}{os.sep}diff0.png", 0)
-    diff_len = len(os.listdir(output_abs_path))
+    diff_len = len([filename for filename in os.listdir(output_abs_path)
+                    if not filename.startswith(CACHE_FILE)])
+    reporter.start(diff_len)
     for x in range(0, diff_len):
         img_name = f"{output_abs_path}{os.sep}diff{x}.png"
         nxt = cv2.imread(img_name, 0)
@@ -49,18 +160,15 @@ def combine_images(input_path, output_path, threshold, force_flag, queue):
                 else:
                     img[i][j] = (int(img[i][j]) + int(nxt[i][j]))/2
         os.remove(f"{output_abs_path}/diff{x}.png")
-        if queue is not None:
-            queue.put(f"Progress: {x}/{diff_len - 1}")
-        print(f"Progress: {x}/{diff_len - 1}", flush=True)
+        reporter.update(x + 1)
 
     for i, row in enumerate(img):
         for j, pixel in enumerate(row):
             if img[i][j] < 255:
                 img[i][j] = 0
-    cv2.imwrite(f"{output_abs_path}{os.sep}mask.png", img)
-    if queue is not None:
-        queue.put("Process successful")
-    print("Process successful", flush=True)
+    mask_path = f"{output_abs_path}{os.sep}mask.png"
+    cv2.imwrite(mask_path, img)
+    return {"mask": mask_path, "frames": diff_len + 1}
 
 def is_dir_empty(path):
     '''Checks if directory provided is empty
@@ -76,38 +184,16 @@ def is_dir_empty(path):
         return next(scan, None) is None
     
 
-def init_argparse() -> argparse.ArgumentParser:
-    parser = argparse.ArgumentParser(prog=sys.argv[0],
-        usage="%(prog)s [-h] [-v] -i INPUT_PATH -o OUTPUT_PATH -t THRESHOLD [-f]", 
-        add_help=False, description="Given input path containing frames, combines them into an image mask"
-    )
-
-    required = parser.add_argument_group('required arguments')
-    required.add_argument("-i", "--infile", action="store", type=pathlib.Path, 
-                          required=True, help = "Full path to directory containing frames")
-    required.add_argument("-o", "--outdir", action="store", type=pathlib.Path, 
-                          required=True, help = "Directory to store final result")
-    required.add_argument("-t", "--threshold", action="store", default="1", type=int, 
-                          required=True, help = "Threshold value calculated by threshold tool")
-
-    optional = parser.add_argument_group('optional arguments')
-    optional.add_argument("-h", "--help", action="help", 
-                          help="show this help message and exit")
-    optional.add_argument("-v", "--version", action="version", 
-                        version=f"{parser.prog} version 1.0.0")
-    optional.add_argument("-f", "--force", action=argparse.BooleanOptionalAction, \
-                        type=bool, help = """Force writes to directory with pre-existing files \
-                    and overwrites old files.""")
-    return parser
-
-def main() -> None:
-    parser = init_argparse()
-    args = parser.parse_args()
+def main(argv=None, prog=None) -> None:
+    parser = init_argparse(prog)
+    args = parser.parse_args(argv)
     try:
-        combine_images(args.infile, args.outdir, args.threshold, args.force)
+        combine_images(args.infile, args.outdir, args.threshold, args.force, 
+                       legacy=args.legacy, progress=args.progress,
+                       cache=args.cache, gray=args.gray)
         exit(0)
     except Exception as err:
-        print(err)
+        report_failure("combine_images", err, progress=args.progress)
         exit(1)
 
 if __name__ == "__main__":
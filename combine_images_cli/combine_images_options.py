@@ -0,0 +1,42 @@
+import sys, argparse, pathlib
+
+from phystracker_cli.events import PROGRESS_FORMATS
+
+# The command line options of combine_images. Kept free of cv2 and numpy, so
+# phystracker can print help and reject bad arguments before importing the
+# stage.
+
+def init_argparse(prog=None) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog=prog or sys.argv[0],
+        usage="%(prog)s [-h] [-v] -i INPUT_PATH -o OUTPUT_PATH -t THRESHOLD [-f] [--legacy] [--gray] [--progress FORMAT] [--no-cache]", 
+        add_help=False, description="Given input path containing frames, combines them into an image mask"
+    )
+
+    required = parser.add_argument_group('required arguments')
+    required.add_argument("-i", "--infile", action="store", type=pathlib.Path, 
+                          required=True, help = "Full path to directory containing frames or a frame store")
+    required.add_argument("-o", "--outdir", action="store", type=pathlib.Path, 
+                          required=True, help = "Directory to store final result")
+    required.add_argument("-t", "--threshold", action="store", default="1", type=int, 
+                          required=True, help = "Threshold value calculated by threshold tool")
+
+    optional = parser.add_argument_group('optional arguments')
+    optional.add_argument("-h", "--help", action="help", 
+                          help="show this help message and exit")
+    optional.add_argument("-v", "--version", action="version", 
+                        version=f"{parser.prog} version 1.0.0")
+    optional.add_argument("-f", "--force", action=argparse.BooleanOptionalAction, \
+                        type=bool, help = """Force writes to directory with pre-existing files \
+                    and overwrites old files.""")
+    optional.add_argument("--legacy", action="store_true",
+                          help = """Use the original per-pixel implementation \
+                    (slow, for verifying the output).""")
+    optional.add_argument("--gray", action="store_true",
+                          help = """Read frames as grayscale and diff single \
+                          channel images""")
+    optional.add_argument("--progress", choices=PROGRESS_FORMATS, default="text",
+                          help = "Print progress as text or as one JSON event per line")
+    optional.add_argument("--no-cache", dest="cache", action="store_false",
+                          help = """Combine again even if mask.png was made \
+                          from the same frames and threshold""")
+    return parser
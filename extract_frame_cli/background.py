@@ -0,0 +1,135 @@
+import cv2
+import numpy as np
+
+from extract_frame_cli.extract_frame_options import (DEFAULT_ALPHA, 
+                                                     DEFAULT_SAMPLES)
+from extract_frame_cli.frame_store import gray_frame
+
+class MeanBackground:
+    '''Average of every frame. Frames are summed in place into one float32
+    buffer, which is exact for videos of up to 65793 frames.'''
+    def __init__(self):
+        self.total = None
+        self.count = 0
+        self.background = None
+
+    def update(self, image):
+        if self.total is None:
+            self.total = np.zeros(image.shape, dtype=np.float32)
+        cv2.accumulate(image, self.total)
+        self.count += 1
+        self.background = None
+
+    def merge(self, total, count):
+        '''Adds a partial sum of count frames computed elsewhere.'''
+        if self.total is None:
+            self.total = total.copy()
+        else:
+            self.total += total
+        self.count += count
+        self.background = None
+
+    def get(self):
+        if self.background is None:
+            self.background = cv2.convertScaleAbs(self.total, 
+                                                  alpha=1 / self.count)
+        return self.background
+
+class ExponentialBackground:
+    '''Exponential moving average of the frames, which follows gradual
+    lighting changes. Pixels that differ from the background by more than
+    foreground_threshold are treated as the moving object and left out, so
+    the object doesn't leave a trail.
+
+    Parameters:
+        alpha(float): Weight of each new frame.
+        initial(ndarray): Starting background, otherwise the first frame.
+        foreground_threshold(int): Matches the threshold in get_positions.
+    '''
+    def __init__(self, alpha=DEFAULT_ALPHA, initial=None, 
+                 foreground_threshold=15):
+        self.alpha = alpha
+        self.foreground_threshold = foreground_threshold
+        self.average = None
+        self.count = 0
+        if initial is not None:
+            self.average = initial.astype(np.float32)
+
+    def update(self, image):
+        if self.average is None:
+            self.average = image.astype(np.float32)
+        else:
+            difference = cv2.absdiff(image, self.get())
+            if difference.ndim == 3:
+                difference = difference.max(axis=2)
+            background_pixels = np.uint8(difference <= self.foreground_threshold)
+            cv2.accumulateWeighted(image, self.average, self.alpha, 
+                                   mask=background_pixels)
+        self.count += 1
+
+    def get(self):
+        return cv2.convertScaleAbs(self.average)
+
+class MedianBackground:
+    '''Per-pixel median of frames sampled across the whole video, which
+    ignores the moving object. It is complete before processing starts,
+    so update() does nothing.'''
+    def __init__(self, frames):
+        if len(frames) == 0:
+            raise ValueError("No frames to build the median background from.")
+        median = np.median(np.stack(frames), axis=0)
+        self.background = np.rint(median).astype(np.uint8)
+        self.count = len(frames)
+
+    def update(self, image):
+        pass
+
+    def get(self):
+        return self.background
+
+def sample_indices(total, samples):
+    '''Returns up to samples indices spread evenly over range(total).'''
+    if total <= 0:
+        return []
+    return sorted(set(np.linspace(0, total - 1, min(samples, total))
+                      .round().astype(int).tolist()))
+
+def sample_video_frames(video_path, samples=DEFAULT_SAMPLES, gray=False):
+    vid = cv2.VideoCapture(str(video_path))
+    total = int(vid.get(cv2.CAP_PROP_FRAME_COUNT))
+    frames = []
+    for index in sample_indices(total, samples):
+        vid.set(cv2.CAP_PROP_POS_FRAMES, index)
+        read_success, image = vid.read()
+        if read_success:
+            frames.append(gray_frame(image) if gray else image)
+    vid.release()
+    return frames
+
+def create_background_model(name, video_path=None, frames=None,
+                            samples=DEFAULT_SAMPLES, alpha=DEFAULT_ALPHA,
+                            gray=False):
+    '''Creates a background model by name.
+
+    Parameters:
+        name(str): One of BACKGROUND_MODELS.
+        video_path(str): Video the median and ema models sample from.
+        frames: Frames from open_frames, sampled when no video is given.
+        samples(int): Number of frames the median is taken over.
+        alpha(float): Weight of each new frame in the ema model.
+        gray(bool): Sample video frames as single channel images.
+    '''
+    if name == "mean":
+        return MeanBackground()
+
+    if name not in ("median", "ema"):
+        raise ValueError(f"Unknown background model {name}.")
+    if video_path is not None:
+        frames = sample_video_frames(video_path, samples, gray)
+    else:
+        frames = [frames[i] for i in sample_indices(len(frames), samples)]
+    median = MedianBackground(frames)
+    if name == "median":
+        return median
+    # Starting from the median avoids comparing early frames to themselves
+    return ExponentialBackground(alpha, initial=median.get())
@@ -1,7 +1,23 @@
-import sys, os, argparse, pathlib, cv2
+import os, cv2
+from multiprocessing import Pool
 from PIL import Image
 from io import BytesIO
 
+from extract_frame_cli.background import (DEFAULT_ALPHA, DEFAULT_SAMPLES, 
+                                          MeanBackground,
+                                          create_background_model)
+from extract_frame_cli.frame_store import (FRAME_EXTENSIONS, MANIFEST_FILE,
+                                           STORE_FILES, FrameStoreWriter, 
+                                           gray_frame, write_frame_manifest)
+from extract_frame_cli.extract_frame_options import init_argparse
+from extract_frame_cli.frame_writer import (DEFAULT_CODEC, DEFAULT_COMPRESSION,
+                                            DEFAULT_QUALITY, DEFAULT_WRITERS,
+                                            AsyncFrameWriter)
+from phystracker_cli.cache import (cached_result, directory_files, invalidate,
+                                   read_records, record_outputs, stage_key,
+                                   video_fingerprint)
+from phystracker_cli.events import ProgressReporter, report_failure
+
 class ExtractFrameException(Exception):
     pass
 
@@ -24,18 +40,64 @@ def is_dir_empty(path):
     with os.scandir(path) as scan:
         return next(scan, None) is None
 
-def extract_frame(video_path, output_path, frame_skip=1, force_flag=False, queue=None):
+def extract_frame(video_path, output_path, frame_skip=1, force_flag=False, queue=None,
+                  background="mean", samples=DEFAULT_SAMPLES, alpha=DEFAULT_ALPHA,
+                  store=False, jobs=1, progress="text", cache=True, 
+                  gray=False, codec=DEFAULT_CODEC, quality=DEFAULT_QUALITY,
+                  compression=DEFAULT_COMPRESSION, writers=DEFAULT_WRITERS):
     '''Converts mp4 video into individual frames and stores in 
     provided output path.
 
     Parameters:
         video_path(str): Path to video.
         output_path(str): Path to output dir.
+        background(str): Background model written to average.jpg, one of
+            BACKGROUND_MODELS.
+        samples(int): Frames sampled by the median and ema models.
+        alpha(float): Weight of each new frame in the ema model.
+        store(bool): Write a memory-mapped frame store (see frame_store)
+            instead of jpg files.
+        jobs(int): Number of processes decoding segments of the video.
+        progress(str): Progress printed to stdout, see ProgressReporter.
+        cache(bool): Skip extraction when output_path already holds the
+            frames of the same video and parameters, see phystracker_cli.cache.
+        gray(bool): Convert frames to single channel as they are decoded,
+            so the frames and background are written as grayscale.
+        codec(str): Format the frames are saved in, one of FRAME_CODECS.
+        quality(int): JPEG quality, 0 to 100.
+        compression(int): PNG compression level, 0 to 9.
+        writers(int): Threads encoding and saving frames while the video
+            is decoded.
     '''
     input_abs_path = str(video_path.resolve())
     output_abs_path = str(output_path.resolve())
     if not str(input_abs_path).endswith(".mp4"):
         raise ValueError(f"Input is not an mp4 file.")
+    # Checked before anything is read or deleted, so invalid options leave
+    # the previous output alone
+    if jobs > 1:
+        if store:
+            raise ValueError("--jobs can't be combined with --store.")
+        if background == "ema":
+            raise ValueError("The ema background needs frames in order, "
+                             "it can't be used with --jobs.")
+
+    reporter = ProgressReporter("extract_frame", queue, progress)
+    key = None
+    if cache:
+        previous = read_records(output_abs_path).get("extract_frame", {})
+        fingerprint = video_fingerprint(input_abs_path, previous.get("video"))
+        key = stage_key("extract_frame", {
+            "video": fingerprint["sha256"], "frame_skip": frame_skip,
+            "background": background, "samples": samples, "alpha": alpha,
+            "store": store, "gray": gray, "codec": codec,
+            "quality": quality if codec == "jpg" else None,
+            "compression": compression if codec == "png" else None})
+        result = cached_result(output_abs_path, "extract_frame", key)
+        if result is not None:
+            reporter.start()
+            reporter.finish(cached=True, **result)
+            return result["fps"], result["frame_delta_t"]
 
     if os.path.exists(output_abs_path):
         if not is_dir_empty(output_abs_path):
@@ -45,10 +107,12 @@ def extract_frame(video_path, output_path, frame_skip=1, force_flag=False, queue
                 # Following xxxx.jpg naming convention
                 for filename in os.listdir(output_abs_path):
                     file_path = os.path.join(output_abs_path, filename)
-                    if filename[-4:].lower() == ".jpg":
+                    if os.path.splitext(filename)[1].lower() in FRAME_EXTENSIONS \
+                        or filename in STORE_FILES or filename == MANIFEST_FILE:
                         os.unlink(file_path)
     else:
         raise FileNotFoundError(f"{output_abs_path} does not exist.")
+    invalidate(output_abs_path, "extract_frame")
 
     vid = cv2.VideoCapture(str(input_abs_path))
 
@@ -59,83 +123,184 @@ def extract_frame(video_path, output_path, frame_skip=1, force_flag=False, queue
         fps = vid.get(cv2.CAP_PROP_FPS)
     frame_delta_t = frame_skip/fps #how far apart the frames are
     total_frame_count = int(vid.get(cv2.CAP_PROP_FRAME_COUNT)) - 1
+    reporter.start(total_frame_count + 1)
 
-    count = 0
-    result_average = None
-    while True:
+    background_model = create_background_model(background, 
+                                                video_path=input_abs_path,
+                                                samples=samples, alpha=alpha,
+                                                gray=gray)
+    store_writer = None
+    frame_writer = None
+    if jobs > 1:
+        vid.release()
+        extract_segments(input_abs_path, output_abs_path, frame_skip, 
+                         background_model, jobs, total_frame_count, reporter,
+                         gray, (codec, quality, compression, writers))
+    else:
+        if store:
+            store_writer = FrameStoreWriter(output_abs_path, fps, frame_delta_t)
+        else:
+            frame_writer = AsyncFrameWriter(output_abs_path, codec, quality,
+                                            compression, writers)
+        manifest = []
+        count = 0
         try:
-            read_success, image = vid.read()
-            if result_average is None:
-                result_average = image.copy()
-            else:
-                if image is not None:
-                    # Getting average background for comparison in get_positions
-                    result_average = result_average * (count / (count+1)) \
-                                     + image * (1 / (count+1))
+            while True:
+                try:
+                    read_success, image = vid.read()
+                    if not read_success:
+                        if count <= 0:
+                            raise ExtractFrameException(f"""Unable to read any frames \
+                                                        from {input_abs_path}.""")
+                        break #TODO: how do we detect error in vid.read()
+                    if gray:
+                        image = gray_frame(image)
+                    # Getting background for comparison in get_positions
+                    background_model.update(image)
+                
+                    if count%frame_skip == 0:
+                        if store_writer is not None:
+                            store_writer.write(count, vid.get(cv2.CAP_PROP_POS_MSEC), 
+                                               image)
+                        else:
+                            # Encoded and saved on the writer's threads
+                            file_name = frame_writer.write(count, image)
+                            manifest.append(manifest_row(
+                                count, vid.get(cv2.CAP_PROP_POS_MSEC), 
+                                file_name, image))
+                        reporter.update(count + 1)
+                except Exception as e:
+                    raise ExtractFrameException(f"Exception converting image into {codec} format. {e}")
+                count += 1
+        except BaseException:
+            if frame_writer is not None:
+                frame_writer.cancel()
+            raise
+        if frame_writer is not None:
+            frame_writer.close()
+            write_frame_manifest(output_abs_path, manifest)
+
+    if store_writer is not None:
+        store_writer.close(background_model.get())
+    else:
+        cv2.imwrite(f"{output_abs_path}{os.sep}average.jpg", background_model.get())
+    if key is not None:
+        record_outputs(output_abs_path, "extract_frame", key, 
+                       directory_files(output_abs_path),
+                       {"fps": fps, "frame_delta_t": frame_delta_t},
+                       video=fingerprint)
+    reporter.finish(fps=fps, frame_delta_t=frame_delta_t)
+    return fps, frame_delta_t
 
+def extract_segments(input_abs_path, output_abs_path, frame_skip, 
+                     background_model, jobs, total_frame_count, reporter,
+                     gray=False, writer_options=(DEFAULT_CODEC, DEFAULT_QUALITY,
+                                                 DEFAULT_COMPRESSION, 
+                                                 DEFAULT_WRITERS)):
+    '''Splits the video into one segment per job and extracts them in
+    parallel. Frames keep the numbering and frame_skip sampling of the
+    sequential extraction, and the partial background sums are merged
+    into background_model. The segments' manifest rows are merged into
+    one manifest.'''
+    frame_count = total_frame_count + 1
+    bounds = [round(frame_count * i / jobs) for i in range(jobs + 1)]
+    # The encoding threads are shared out between the segment processes
+    codec, quality, compression, writers = writer_options
+    writer_options = (codec, quality, compression, max(writers // jobs, 1))
+    segments = []
+    for i in range(jobs):
+        # The frame count is only an estimate, the last segment reads to the end
+        end = bounds[i + 1] if i < jobs - 1 else None
+        if end is None or bounds[i] < end:
+            segments.append((input_abs_path, output_abs_path, bounds[i], end,
+                             frame_skip, 
+                             isinstance(background_model, MeanBackground),
+                             gray, writer_options))
+
+    count = 0
+    manifest = []
+    with Pool(len(segments)) as pool:
+        for total, segment_count, rows in pool.imap_unordered(_extract_segment, 
+                                                              segments):
+            if total is not None:
+                background_model.merge(total, segment_count)
+            count += segment_count
+            manifest.extend(rows)
+            reporter.update(count)
+    if count <= 0:
+        raise ExtractFrameException(f"Unable to read any frames from {input_abs_path}.")
+    write_frame_manifest(output_abs_path, sorted(manifest))
+
+def _extract_segment(segment):
+    (input_abs_path, output_abs_path, start, end, frame_skip, average, 
+     gray, writer_options) = segment
+    vid = cv2.VideoCapture(input_abs_path)
+    if start > 0:
+        vid.set(cv2.CAP_PROP_POS_FRAMES, start)
+    background_model = MeanBackground() if average else None
+    frame_writer = AsyncFrameWriter(output_abs_path, *writer_options)
+    manifest = []
+    count = start
+    try:
+        while end is None or count < end:
+            read_success, image = vid.read()
             if not read_success:
-                if count <= 0:
-                    raise ExtractFrameException(f"""Unable to read any frames \
-                                                from {input_abs_path}.""")
-                break #TODO: how do we detect error in vid.read()
-            
+                break
+            if count == start > 0:
+                check_seek(vid, start)
+            if gray:
+                image = gray_frame(image)
+            if background_model is not None:
+                background_model.update(image)
             if count%frame_skip == 0:
-                write_path = f"{output_abs_path}{os.sep}{str(count).zfill(5)}.jpg"
-                write_success = cv2.imwrite(write_path, image) # save as JPEG
-                if queue is not None:
-                    queue.put(f"Progress: {count}/{total_frame_count}")
-                print(f"Progress: {count}/{total_frame_count}", flush=True)
-            if not write_success:
-                raise ExtractFrameException(f"Unable to save to jpg.")
-        except Exception as e:
-            raise ExtractFrameException(f"Exception converting image into jpg format. {e}")
-        count += 1
-
-    cv2.imwrite(f"{output_abs_path}{os.sep}average.jpg", result_average)
-    if queue is not None:
-        queue.put(f"frame_delta_t={frame_delta_t}")
-        queue.put("Process successful")
-    print("Process successful", flush=True)
-    return fps, frame_delta_t
+                file_name = frame_writer.write(count, image)
+                manifest.append(manifest_row(
+                    count, vid.get(cv2.CAP_PROP_POS_MSEC), file_name, image))
+            count += 1
+    except BaseException:
+        frame_writer.cancel()
+        raise
+    frame_writer.close()
+    vid.release()
+    if background_model is None or background_model.count == 0:
+        return None, count - start, manifest
+    return background_model.total, background_model.count, manifest
+
+def check_seek(vid, frame):
+    '''Checks that the frame just read after seeking is frame. Seeking by
+    frame number lands on a nearby keyframe in some videos while
+    CAP_PROP_POS_FRAMES still reports the frame asked for, so the decoded
+    frame's timestamp is compared with the frame's time instead.'''
+    fps = vid.get(cv2.CAP_PROP_FPS)
+    timestamp = vid.get(cv2.CAP_PROP_POS_MSEC)
+    # Off by more than half a frame means a different frame was decoded
+    if fps <= 0 or abs(timestamp - frame / fps * 1000) > 500 / fps:
+        raise ExtractFrameException(f"Unable to seek to frame {frame}, "
+                                    "extract without --jobs.")
+
+def manifest_row(index, timestamp, file_name, image):
+    return (index, timestamp, file_name, image.shape[1], image.shape[0])
 
-def init_argparse() -> argparse.ArgumentParser:
-    parser = argparse.ArgumentParser(prog=sys.argv[0],
-        usage="%(prog)s [-h] [-v] -i INPUT_PATH -o OUTPUT_PATH -s SKIP_NUM [-f]", 
-        add_help=False,
-    description="Converts mp4 video into photo"
-    )
-
-    required = parser.add_argument_group('required arguments')
-    required.add_argument("-i", "--infile", action="store", type=pathlib.Path, 
-                          required=True, help = "Full path to an mp4 file")
-    required.add_argument("-o", "--outdir", action="store", type=pathlib.Path, 
-                          required=True, help = """Empty directory to store frames in. \
-                          Output = nnnn.jpg and starts from 0000 onwards""")
-
-    optional = parser.add_argument_group('optional arguments')
-    optional.add_argument("-h", "--help", action="help", 
-                          help="show this help message and exit")
-    optional.add_argument("-v", "--version", action="version", 
-                        version=f"{parser.prog} version 1.0.0")
-    optional.add_argument("-s", "--skip", action="store", default="1", type=int, 
-                          help = "Choose interval of frames to process.")
-    optional.add_argument("-f", "--force", action=argparse.BooleanOptionalAction, \
-                        type=bool, help = """Force writes to directory with pre-existing files \
-                    and overwrites old files.""")
-    return parser
-
-def main() -> None:
-    parser = init_argparse()
-    args = parser.parse_args()
+def main(argv=None, prog=None) -> None:
+    parser = init_argparse(prog)
+    args = parser.parse_args(argv)
     try:
         fps, frame_delta_t = extract_frame(args.infile, args.outdir, args.skip, 
-                                      args.force)
+                                      args.force, background=args.background,
+                                      samples=args.samples, alpha=args.alpha,
+                                      store=args.store, jobs=args.jobs,
+                                      progress=args.progress, cache=args.cache,
+                                      gray=args.gray, codec=args.codec,
+                                      quality=args.quality, 
+                                      compression=args.compression,
+                                      writers=args.writers)
 
-        print(f"frame_rate = {fps}")
-        print(f"frame_delta_t = {frame_delta_t}")
+        if args.progress == "text":
+            print(f"frame_rate = {fps}")
+            print(f"frame_delta_t = {frame_delta_t}")
         exit(0)
     except Exception as err:
-        print(err, file=sys.stderr)
+        report_failure("extract_frame", err, progress=args.progress)
         exit(1)
 
 if __name__ == "__main__":
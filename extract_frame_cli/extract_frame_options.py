@@ -0,0 +1,84 @@
+import sys, argparse, pathlib, os
+
+from phystracker_cli.events import PROGRESS_FORMATS
+
+# The command line options of extract_frame and the defaults they share with
+# the other stages. Kept free of cv2 and numpy, so phystracker can print help
+# and reject bad arguments before importing the stage.
+
+BACKGROUND_MODELS = ("mean", "median", "ema")
+DEFAULT_SAMPLES = 25
+DEFAULT_ALPHA = 0.05
+
+# jpg: lossy, smallest and fast to encode
+# png: lossless, compression level trades size for speed
+# webp: lossless WebP, smaller than png but slower to encode
+# npy: raw array, no encoding at all but the largest
+FRAME_CODECS = ("jpg", "png", "webp", "npy")
+DEFAULT_CODEC = "jpg"
+# OpenCV's own defaults
+DEFAULT_QUALITY = 95
+DEFAULT_COMPRESSION = 1
+DEFAULT_WRITERS = max(min(os.cpu_count() or 1, 4), 1)
+
+def init_argparse(prog=None) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog=prog or sys.argv[0],
+        usage="%(prog)s [-h] [-v] -i INPUT_PATH -o OUTPUT_PATH -s SKIP_NUM [-f] [-b MODEL] [--store] [-j JOBS] [--gray] [--codec CODEC] [--quality N] [--compression N] [--writers N] [--progress FORMAT] [--no-cache]", 
+        add_help=False,
+    description="Converts mp4 video into photo"
+    )
+
+    required = parser.add_argument_group('required arguments')
+    required.add_argument("-i", "--infile", action="store", type=pathlib.Path, 
+                          required=True, help = "Full path to an mp4 file")
+    required.add_argument("-o", "--outdir", action="store", type=pathlib.Path, 
+                          required=True, help = """Empty directory to store frames in. \
+                          Output = nnnn.jpg and starts from 0000 onwards""")
+
+    optional = parser.add_argument_group('optional arguments')
+    optional.add_argument("-h", "--help", action="help", 
+                          help="show this help message and exit")
+    optional.add_argument("-v", "--version", action="version", 
+                        version=f"{parser.prog} version 1.0.0")
+    optional.add_argument("-s", "--skip", action="store", default="1", type=int, 
+                          help = "Choose interval of frames to process.")
+    optional.add_argument("-f", "--force", action=argparse.BooleanOptionalAction, \
+                        type=bool, help = """Force writes to directory with pre-existing files \
+                    and overwrites old files.""")
+    optional.add_argument("-b", "--background", choices=BACKGROUND_MODELS, 
+                          default="mean", help = """Background model saved as \
+                          average.jpg: mean of all frames, median of sampled \
+                          frames or exponential moving average""")
+    optional.add_argument("--samples", action="store", type=int, 
+                          default=DEFAULT_SAMPLES, 
+                          help = "Frames sampled for the median background")
+    optional.add_argument("--alpha", action="store", type=float, 
+                          default=DEFAULT_ALPHA, 
+                          help = "Weight of each frame in the ema background")
+    optional.add_argument("--store", action="store_true", 
+                          help = """Save frames losslessly to one memory-mapped \
+                          file (frames.raw, frames.json) instead of jpg files""")
+    optional.add_argument("-j", "--jobs", action="store", type=int, default=1,
+                          help = "Number of processes decoding the video in parallel")
+    optional.add_argument("--codec", choices=FRAME_CODECS, default=DEFAULT_CODEC,
+                          help = """Format frames are saved in: jpg, png, lossless \
+                          webp or raw npy arrays""")
+    optional.add_argument("--quality", action="store", type=int, 
+                          default=DEFAULT_QUALITY, choices=range(0, 101),
+                          metavar="N", help = "JPEG quality, 0 to 100")
+    optional.add_argument("--compression", action="store", type=int, 
+                          default=DEFAULT_COMPRESSION, choices=range(0, 10),
+                          metavar="N", help = """PNG compression level, 0 (fastest) \
+                          to 9 (smallest)""")
+    optional.add_argument("--writers", action="store", type=int, 
+                          default=DEFAULT_WRITERS,
+                          help = "Threads encoding and saving frames")
+    optional.add_argument("--gray", action="store_true",
+                          help = """Convert frames to grayscale as they are decoded \
+                          and save single channel frames and background""")
+    optional.add_argument("--progress", choices=PROGRESS_FORMATS, default="text",
+                          help = "Print progress as text or as one JSON event per line")
+    optional.add_argument("--no-cache", dest="cache", action="store_false",
+                          help = """Extract again even if the output directory \
+                          holds frames of the same video and options""")
+    return parser
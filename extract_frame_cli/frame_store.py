@@ -0,0 +1,218 @@
+import os, csv, json
+import cv2
+import numpy as np
+
+# A frame store is a directory holding every frame in one raw uint8 array
+# file, read back with np.memmap, plus a JSON sidecar describing it.
+STORE_DATA = "frames.raw"
+STORE_INFO = "frames.json"
+STORE_BACKGROUND = "background.npy"
+STORE_FILES = (STORE_DATA, STORE_INFO, STORE_BACKGROUND)
+FRAME_EXTENSIONS = (".jpg", ".png", ".webp", ".npy")
+# Frames saved as image files are listed in a manifest, one row per frame
+# in order, so readers don't have to list the directory. timestamp_ms is
+# the frame's time in the source video.
+MANIFEST_FILE = "manifest.csv"
+MANIFEST_FIELDS = ("index", "timestamp_ms", "file", "width", "height")
+
+class FrameStoreWriter:
+    '''Appends frames to a frame store in output_path.
+
+    Parameters:
+        output_path(str): Directory to write the store to.
+        fps(float): Frame rate of the source video.
+        frame_delta_t(float): Time between stored frames in seconds.
+    '''
+    def __init__(self, output_path, fps, frame_delta_t):
+        self.output_path = output_path
+        self.fps = fps
+        self.frame_delta_t = frame_delta_t
+        self.shape = None
+        self.indices = []
+        self.timestamps = []
+        self.file = open(os.path.join(output_path, STORE_DATA), "wb")
+
+    def write(self, index, timestamp, image):
+        if self.shape is None:
+            self.shape = image.shape
+        elif image.shape != self.shape:
+            raise ValueError(f"Frame {index} has shape {image.shape}, "
+                             f"expected {self.shape}.")
+        self.file.write(np.ascontiguousarray(image, dtype=np.uint8).data)
+        self.indices.append(index)
+        self.timestamps.append(timestamp)
+
+    def close(self, background=None):
+        self.file.close()
+        if background is not None:
+            np.save(os.path.join(self.output_path, STORE_BACKGROUND),
+                    background)
+        info = {
+            "shape": [len(self.indices), *(self.shape or ())],
+            "dtype": "uint8",
+            "fps": self.fps,
+            "frame_delta_t": self.frame_delta_t,
+            "frame_indices": self.indices,
+            "timestamps": self.timestamps,
+        }
+        with open(os.path.join(self.output_path, STORE_INFO), "w") as info_file:
+            json.dump(info, info_file)
+
+class FrameStore:
+    '''Read-only frame store. Frames are memory-mapped, so indexing returns
+    a view of the file rather than a decoded copy. With gray, colour frames
+    are converted to single channel as they are read.'''
+    def __init__(self, path, gray=False):
+        self.path = str(path)
+        self.gray = gray
+        with open(os.path.join(self.path, STORE_INFO)) as info_file:
+            info = json.load(info_file)
+        self.fps = info["fps"]
+        self.frame_delta_t = info["frame_delta_t"]
+        self.indices = info["frame_indices"]
+        self.timestamps = info["timestamps"]
+        shape = tuple(info["shape"])
+        if shape[0] == 0:
+            self.frames = np.empty(shape, dtype=info["dtype"])
+        else:
+            self.frames = np.memmap(os.path.join(self.path, STORE_DATA),
+                                    dtype=info["dtype"], mode="r",
+                                    shape=shape)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, i):
+        if self.gray:
+            return gray_frame(self.frames[i])
+        return self.frames[i]
+
+    def __iter__(self):
+        if self.gray:
+            return map(gray_frame, self.frames)
+        return iter(self.frames)
+
+    def background(self):
+        background = np.load(os.path.join(self.path, STORE_BACKGROUND),
+                             mmap_mode="r")
+        if self.gray:
+            return gray_frame(background)
+        return background
+
+class FrameDirectory:
+    '''Frames saved as image files, in the order of the directory's
+    manifest. Directories without one (written before manifests existed)
+    are listed in file name order and have no timestamps. With gray,
+    frames are decoded straight to single channel.'''
+    def __init__(self, path, avg_file_name="average.jpg", gray=False):
+        self.path = str(path)
+        self.avg_file_name = avg_file_name
+        self.flags = cv2.IMREAD_GRAYSCALE if gray else cv2.IMREAD_COLOR
+        manifest = read_frame_manifest(self.path)
+        if manifest is not None:
+            self.paths = [os.path.join(self.path, row["file"]) 
+                          for row in manifest]
+            self.indices = [row["index"] for row in manifest]
+            self.timestamps = [row["timestamp_ms"] for row in manifest]
+            return
+        self.paths = []
+        self.indices = None
+        self.timestamps = None
+        for filename in sorted(os.listdir(self.path)):
+            name, ext = os.path.splitext(filename)
+            # Frames are named by their index, which also keeps stray
+            # images and background.npy out
+            if ext.lower() in FRAME_EXTENSIONS and name.isdigit():
+                self.paths.append(os.path.join(self.path, filename))
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, i):
+        if self.paths[i].lower().endswith(".npy"):
+            frame = np.load(self.paths[i])
+            if self.flags == cv2.IMREAD_GRAYSCALE:
+                return gray_frame(frame)
+            if frame.ndim == 2:
+                # Saved with --gray, match imread's colour frames and
+                # background
+                return cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+            return frame
+        return cv2.imread(self.paths[i], self.flags)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def background(self):
+        return cv2.imread(os.path.join(self.path, self.avg_file_name), 
+                          self.flags)
+
+def write_frame_manifest(path, rows):
+    '''Writes the manifest of a frame directory.
+
+    Parameters:
+        path(str): Frame directory.
+        rows(list): (index, timestamp_ms, file, width, height) per frame, in
+            the order the frames are read.
+    '''
+    with open(os.path.join(str(path), MANIFEST_FILE), "w", 
+              newline="") as manifest_file:
+        writer = csv.writer(manifest_file)
+        writer.writerow(MANIFEST_FIELDS)
+        writer.writerows(rows)
+
+def read_frame_manifest(path):
+    '''Reads the manifest of a frame directory.
+
+    Return:
+        list: One dict per frame with the MANIFEST_FIELDS, None if the
+        directory has no manifest.
+    '''
+    manifest_path = os.path.join(str(path), MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, newline="") as manifest_file:
+        return [{"index": int(row["index"]), 
+                 "timestamp_ms": float(row["timestamp_ms"]),
+                 "file": row["file"], "width": int(row["width"]),
+                 "height": int(row["height"])}
+                for row in csv.DictReader(manifest_file)]
+
+def frame_times(timestamps, frame_duration, count):
+    '''Time of each of count frames in seconds from the first. Uses the
+    source video's timestamps when they are known and increasing, so
+    variable frame rate videos are timed correctly, otherwise spaces the
+    frames frame_duration apart.
+
+    Parameters:
+        timestamps(list): Timestamp of each frame in milliseconds, or None.
+        frame_duration(float): Seconds between frames.
+        count(int): Number of frames.
+
+    Return:
+        ndarray: One time per frame.
+    '''
+    if timestamps is not None and len(timestamps) == count > 0:
+        timestamps = np.asarray(timestamps, dtype=float)
+        if np.all(np.diff(timestamps) > 0):
+            return (timestamps - timestamps[0]) / 1000
+    return np.arange(count) * frame_duration
+
+def gray_frame(image):
+    '''Single channel version of a BGR frame. Frames that are already
+    single channel are returned unchanged.'''
+    if image.ndim == 2:
+        return image
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+def is_frame_store(path):
+    return os.path.exists(os.path.join(str(path), STORE_INFO))
+
+def open_frames(path, avg_file_name="average.jpg", gray=False):
+    '''Opens the frames extract_frame wrote to path, either as a frame
+    store or as a directory of images. With gray, every frame and the
+    background are returned as single channel uint8 images.'''
+    if is_frame_store(path):
+        return FrameStore(path, gray)
+    return FrameDirectory(path, avg_file_name, gray)
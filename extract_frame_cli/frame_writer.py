@@ -0,0 +1,100 @@
+import os, threading
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+
+from extract_frame_cli.extract_frame_options import (DEFAULT_CODEC,
+                                                     DEFAULT_COMPRESSION,
+                                                     DEFAULT_QUALITY, 
+                                                     DEFAULT_WRITERS)
+
+# Frames waiting to be encoded per writer thread, bounds the memory used
+# when decoding is faster than encoding
+QUEUE_PER_WRITER = 4
+
+def frame_file_name(index, codec=DEFAULT_CODEC):
+    return f"{str(index).zfill(5)}.{codec}"
+
+def encode_params(codec, quality=DEFAULT_QUALITY,
+                  compression=DEFAULT_COMPRESSION):
+    '''cv2.imwrite parameters for codec.'''
+    if codec == "jpg":
+        return [cv2.IMWRITE_JPEG_QUALITY, quality]
+    elif codec == "png":
+        return [cv2.IMWRITE_PNG_COMPRESSION, compression]
+    elif codec == "webp":
+        # A quality above 100 selects lossless WebP
+        return [cv2.IMWRITE_WEBP_QUALITY, 101]
+    elif codec == "npy":
+        return []
+    raise ValueError(f"Unknown frame codec {codec}.")
+
+def write_frame(path, image, codec=DEFAULT_CODEC, params=()):
+    if codec == "npy":
+        np.save(path, image)
+    elif not cv2.imwrite(path, image, list(params)):
+        raise IOError(f"Unable to save {path}.")
+
+class AsyncFrameWriter:
+    '''Encodes and saves frames on a pool of threads, so encoding overlaps
+    with decoding. OpenCV and NumPy release the GIL while encoding and
+    writing. write() blocks once queue_size frames are waiting, and an
+    error in a writer thread is raised by the next write() or by close().
+
+    Parameters:
+        output_path(str): Directory the frames are saved in.
+        codec(str): One of FRAME_CODECS, also the file extension.
+        quality(int): JPEG quality, 0 to 100.
+        compression(int): PNG compression level, 0 to 9.
+        writers(int): Number of encoding threads.
+        queue_size(int): Most frames waiting to be encoded.
+    '''
+    def __init__(self, output_path, codec=DEFAULT_CODEC,
+                 quality=DEFAULT_QUALITY, compression=DEFAULT_COMPRESSION,
+                 writers=DEFAULT_WRITERS, queue_size=None):
+        self.output_path = str(output_path)
+        self.codec = codec
+        self.params = encode_params(codec, quality, compression)
+        self.executor = ThreadPoolExecutor(max(writers, 1))
+        self.slots = threading.BoundedSemaphore(
+            queue_size or max(writers, 1) * QUEUE_PER_WRITER)
+        self.error = None
+
+    def write(self, index, image):
+        '''Queues frame index to be saved. image must not be modified
+        afterwards.
+
+        Return:
+            str: Name of the file the frame is saved to.
+        '''
+        self.raise_error()
+        file_name = frame_file_name(index, self.codec)
+        path = os.path.join(self.output_path, file_name)
+        self.slots.acquire()
+        try:
+            future = self.executor.submit(write_frame, path, image,
+                                          self.codec, self.params)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(self.written)
+        return file_name
+
+    def written(self, future):
+        self.slots.release()
+        if not future.cancelled() and future.exception() is not None \
+            and self.error is None:
+            self.error = future.exception()
+
+    def close(self):
+        '''Waits for every queued frame to be saved.'''
+        self.executor.shutdown(wait=True)
+        self.raise_error()
+
+    def cancel(self):
+        '''Stops without saving the frames still queued.'''
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def raise_error(self):
+        if self.error is not None:
+            raise self.error
@@ -0,0 +1,71 @@
+import numpy as np
+
+# Points drawn at most per series, more than a plot's width in pixels
+MAX_POINTS = 2000
+
+def lttb(x, y, threshold=MAX_POINTS):
+    '''Largest-Triangle-Three-Buckets downsampling. Keeps the first and last
+    point and, from each of threshold - 2 equal buckets in between, the
+    point forming the largest triangle with the point kept from the
+    previous bucket and the average of the next bucket. Peaks and the
+    overall shape survive, unlike taking every nth point.
+
+    Parameters:
+        x(array): Sorted x values.
+        y(array): y values.
+        threshold(int): Number of points to keep.
+
+    Return:
+        array: Indices of the kept points, in order.
+    '''
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    count = len(x)
+    if threshold >= count or threshold < 3:
+        return np.arange(count)
+
+    # Bucket i holds points edges[i] to edges[i + 1], the first and last
+    # points are kept on their own
+    edges = np.linspace(1, count - 1, threshold - 1).astype(int)
+    sizes = np.diff(edges)
+    average_x = np.add.reduceat(x[:count - 1], edges[:-1]) / sizes
+    average_y = np.add.reduceat(y[:count - 1], edges[:-1]) / sizes
+    # The third corner of each bucket's triangles, the next bucket's
+    # average or the last point
+    next_x = np.append(average_x[1:], x[-1])
+    next_y = np.append(average_y[1:], y[-1])
+
+    kept = np.empty(threshold, dtype=int)
+    kept[0] = 0
+    kept[-1] = count - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        previous_x, previous_y = x[previous], y[previous]
+        # Twice the triangle area, the constant factor doesn't matter
+        areas = np.abs((previous_x - next_x[bucket]) * (y[start:end] - previous_y)
+                       - (previous_x - x[start:end]) * (next_y[bucket] - previous_y))
+        previous = start + int(np.argmax(areas))
+        kept[bucket + 1] = previous
+    return kept
+
+def downsample(x, y, threshold=MAX_POINTS, x_range=None):
+    '''Indices of at most threshold points to draw, chosen with lttb. With
+    x_range only the points inside it (and one either side, so lines reach
+    the edges) are considered, so zooming in brings back full resolution.
+
+    Parameters:
+        x(array): Sorted x values.
+        y(array): y values.
+        threshold(int): Most points to keep.
+        x_range(tuple): (minimum, maximum) visible x, or None for all.
+
+    Return:
+        array: Indices of the points to draw, in order.
+    '''
+    start, end = 0, len(x)
+    if x_range is not None:
+        start = max(int(np.searchsorted(x, x_range[0], side="left")) - 1, 0)
+        end = min(int(np.searchsorted(x, x_range[1], side="right")) + 1,
+                  len(x))
+    return start + lttb(x[start:end], y[start:end], threshold)
@@ -1,41 +1,69 @@
-import matplotlib.pyplot as plt
-import numpy as np
-import argparse, pathlib, sys
-import pandas as pd
+import sys
+from generate_graph_cli.generate_graph_options import init_argparse
+from generate_graph_cli.kinematics import (DEFAULT_METHOD, DEFAULT_ORDER,
+                                           DEFAULT_WINDOW, derivatives, 
+                                           split_tracks)
+from get_positions_cli.trajectory import read_trajectory
 
-def show_plot(csv_file, plot_type):
-    times, x_coords, y_coords = read_csv(csv_file)
-    if plot_type == 'x':
-        plot_generic(times, x_coords, 'Time (seconds)', 'X Coordinate', 
-                     'X Coordinate vs Time')
-    elif plot_type == 'y':
-        plot_generic(times, y_coords, 'Time (seconds)', 'Y Coordinate', 
-                     'Y Coordinate vs Time')
-    elif plot_type == 'x_velocity':
-        x_velocity, times = calculate_velocity(x_coords, times)
-        plot_generic(times, x_velocity, 'Time (seconds)', 
-                        'X Velocity (m/s)', 'X Velocity vs Time')
-    elif plot_type == 'y_velocity':
-        y_velocity, times = calculate_velocity(y_coords, times)
-        plot_generic(times, y_velocity, 'Time (seconds)', 
-                     'Y Velocity (m/s)', 'Y Velocity vs Time')
-    elif plot_type == 'x_acceleration':
-        x_acceleration, times = calculate_acceleration(x_coords, times)
-        plot_generic(times, x_acceleration, 'Time (seconds)', 
-                        'X Acceleration (m$^2$/s)', 'X Acceleration vs Time')
-    elif plot_type == 'y_acceleration':
-        y_acceleration, times = calculate_acceleration(y_coords, times)
-        plot_generic(times, y_acceleration, 'Time (seconds)', 
-                        'Y Velocity (m$^2$/s)', 'Y Acceleration vs Time')
-    else:
+# Axis label and title of each plot type
+PLOT_LABELS = {
+    'x': ('X Coordinate', 'X Coordinate vs Time'),
+    'y': ('Y Coordinate', 'Y Coordinate vs Time'),
+    'x_velocity': ('X Velocity (m/s)', 'X Velocity vs Time'),
+    'y_velocity': ('Y Velocity (m/s)', 'Y Velocity vs Time'),
+    'x_acceleration': ('X Acceleration (m$^2$/s)', 'X Acceleration vs Time'),
+    'y_acceleration': ('Y Velocity (m$^2$/s)', 'Y Acceleration vs Time'),
+}
+
+def show_plot(csv_file, plot_type, method=DEFAULT_METHOD, 
+              window=DEFAULT_WINDOW, order=DEFAULT_ORDER):
+    if plot_type not in PLOT_LABELS:
         print(f"Invalid plot type")
+        return
+    # pyplot takes most of a second to import, so only when plotting
+    import matplotlib.pyplot as plt
+    tracks = read_tracks(csv_file)
+    print(f"Read {sum(len(track[1][0]) for track in tracks)} positions from "
+          f"{csv_file}")
+    for label, (times, x_coords, y_coords) in tracks:
+        coords = x_coords if plot_type.startswith('x') else y_coords
+        if plot_type.endswith('velocity'):
+            times, coords, _, _ = derivatives(times, coords, method, window, 
+                                              order)
+        elif plot_type.endswith('acceleration'):
+            _, _, times, coords = derivatives(times, coords, method, window, 
+                                              order)
+        plt.plot(times, coords, 'o', label=label)
+    y_label, title = PLOT_LABELS[plot_type]
+    plt.xlabel('Time (seconds)')
+    plt.ylabel(y_label)
+    plt.title(title)
+    plt.grid(True)
+    if len(tracks) > 1:
+        plt.legend()
+    plt.show()
 
 def read_csv(csv_file):
-    df = pd.read_csv(csv_file)
-    print(df)
-    return df['Time'].values, df['x'].values, df['y'].values
+    columns = read_trajectory(csv_file)
+    return columns['Time'], columns['x'], columns['y']
+
+def read_tracks(csv_file):
+    '''Reads a position file, splitting it by the track column that
+    multi-object tracking writes.
+
+    Return:
+        list: (label, (times, x, y)) for each track, a single entry with
+        label None for a single object position file.
+    '''
+    columns = read_trajectory(csv_file)
+    if 'track' not in columns:
+        return [(None, (columns['Time'], columns['x'], columns['y']))]
+    return [(f"Track {int(track_id)}", tuple(track_columns))
+            for track_id, track_columns in split_tracks(
+                columns['track'], columns['Time'], columns['x'], columns['y'])]
 
 def plot_generic(x_data, y_data, x_label, y_label, title):
+    import matplotlib.pyplot as plt
     plt.plot(x_data, y_data, 'o')
     plt.xlabel(x_label)
     plt.ylabel(y_label)
@@ -43,49 +71,21 @@ def plot_generic(x_data, y_data, x_label, y_label, title):
     plt.grid(True)
     plt.show()
 
-def calculate_velocity(coords, times):
-    coord_series = pd.Series(coords)
-    time_series = pd.Series(times)
-    delta_coord = coord_series.diff().iloc[1:]
-    delta_time = time_series.diff().iloc[1:]
-    velocities = delta_coord / delta_time
-    aligned_times = time_series.iloc[1:]
-    return velocities.values, aligned_times.values
-
-def calculate_acceleration(coords, times):
-    coord_series = pd.Series(coords)
-    time_series = pd.Series(times)
-    velocity, time = calculate_velocity(coord_series, time_series)
-    delta_velocity = pd.Series(velocity).diff().iloc[1:]
-    delta_time = pd.Series(time).diff().iloc[1:]
-    accelerations = delta_velocity / delta_time
-    aligned_times = time_series.iloc[2:]
-    return accelerations.values, aligned_times.values
-
-def init_argparse() -> argparse.ArgumentParser:
-    graph_choices = ["x", "y", "x_velocity", "y_velocity", "x_acceleration", "y_acceleration"]
-    parser = argparse.ArgumentParser(prog=sys.argv[0],
-    usage=f"%(prog)s [-h] [-v] -c CSV_FILE -t | --type {graph_choices}", 
-    add_help=False, description="Generates a range of different graphs based on CSV file provided")
-
-    required = parser.add_argument_group('required arguments')
-    required.add_argument("-i", "--infile", action="store", type=pathlib.Path,
-                          required=True, help = "Full path to the input CSV file")
-    required.add_argument("-t", "--type", type=str, choices=graph_choices, 
-                          required=True, help = "Type of plot to generate")
+def calculate_velocity(coords, times, method=DEFAULT_METHOD):
+    velocity_times, velocities, _, _ = derivatives(times, coords, method)
+    return velocities, velocity_times
 
-    optional = parser.add_argument_group('optional arguments')
-    optional.add_argument("-h", "--help", action="help", 
-                          help="show this help message and exit")
-    optional.add_argument("-v", "--version", action="version", 
-                        version=f"{parser.prog} version 1.0.0")
-    return parser
+def calculate_acceleration(coords, times, method=DEFAULT_METHOD):
+    _, _, acceleration_times, accelerations = derivatives(times, coords, 
+                                                          method)
+    return accelerations, acceleration_times
 
-def main() -> None:
-    parser = init_argparse()
-    args = parser.parse_args()
+def main(argv=None, prog=None) -> None:
+    parser = init_argparse(prog)
+    args = parser.parse_args(argv)
     try:
-        show_plot(args.infile, args.type)
+        show_plot(args.infile, args.type, args.method, args.window, 
+                  args.order)
         exit(0)
     except Exception as err:
         print(err, file=sys.stderr)
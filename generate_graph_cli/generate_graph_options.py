@@ -0,0 +1,42 @@
+import sys, argparse, pathlib
+
+# The command line options of generate_graph and the derivative defaults.
+# Kept free of numpy and matplotlib, so phystracker can print help and
+# reject bad arguments before importing the stage.
+
+# backward: difference with the previous sample, as the graphs always used
+# central: second order central difference, handles uneven time steps
+# savgol: Savitzky-Golay, a polynomial fitted to a sliding window
+DERIVATIVE_METHODS = ("backward", "central", "savgol")
+DEFAULT_METHOD = "backward"
+# Savitzky-Golay window length (odd, in samples) and polynomial order
+DEFAULT_WINDOW = 7
+DEFAULT_ORDER = 2
+
+def init_argparse(prog=None) -> argparse.ArgumentParser:
+    graph_choices = ["x", "y", "x_velocity", "y_velocity", "x_acceleration", "y_acceleration"]
+    parser = argparse.ArgumentParser(prog=prog or sys.argv[0],
+    usage=f"%(prog)s [-h] [-v] -c CSV_FILE -t | --type {graph_choices} [--method METHOD] [--window N] [--order N]", 
+    add_help=False, description="Generates a range of different graphs based on CSV file provided")
+
+    required = parser.add_argument_group('required arguments')
+    required.add_argument("-i", "--infile", action="store", type=pathlib.Path,
+                          required=True, help = "Full path to the position file (.csv, .npy or .parquet)")
+    required.add_argument("-t", "--type", type=str, choices=graph_choices, 
+                          required=True, help = "Type of plot to generate")
+
+    optional = parser.add_argument_group('optional arguments')
+    optional.add_argument("-h", "--help", action="help", 
+                          help="show this help message and exit")
+    optional.add_argument("-v", "--version", action="version", 
+                        version=f"{parser.prog} version 1.0.0")
+    optional.add_argument("--method", choices=DERIVATIVE_METHODS, 
+                          default=DEFAULT_METHOD,
+                          help = """How velocity and acceleration are computed: \
+                          backward or central difference, or a savgol (Savitzky-Golay) \
+                          smoothing fit""")
+    optional.add_argument("--window", type=int, default=DEFAULT_WINDOW,
+                          help = "Savitzky-Golay window length in samples, odd")
+    optional.add_argument("--order", type=int, default=DEFAULT_ORDER,
+                          help = "Savitzky-Golay polynomial order, at least 2")
+    return parser
@@ -0,0 +1,106 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from generate_graph_cli.generate_graph_options import (DEFAULT_METHOD, 
+                                                       DEFAULT_ORDER,
+                                                       DEFAULT_WINDOW,
+                                                       DERIVATIVE_METHODS)
+
+def derivatives(times, coords, method=DEFAULT_METHOD, window=DEFAULT_WINDOW,
+                order=DEFAULT_ORDER):
+    '''Velocity and acceleration of coordinates sampled at times.
+
+    coords may hold any number of series sampled at the same times, with
+    time on the last axis, e.g. shape (2, n) for x and y or
+    (tracks, 2, n) for equally long tracks. Every series is differentiated
+    at once.
+
+    Parameters:
+        times(array): Sample times in seconds, shape (n,).
+        coords(array): Positions, shape (..., n).
+        method(str): One of DERIVATIVE_METHODS.
+        window(int): Savitzky-Golay window length, odd.
+        order(int): Savitzky-Golay polynomial order, at least 2.
+
+    Return:
+        tuple: velocity times, velocities, acceleration times and
+        accelerations. The edges of the series are dropped where a
+        derivative can't be computed. savgol uses the central difference
+        on series shorter than window.
+    '''
+    times = np.asarray(times, dtype=float)
+    coords = np.asarray(coords, dtype=float)
+    if coords.shape[-1] != times.shape[0]:
+        raise ValueError("coords and times must have the same number of "
+                         "samples.")
+    if method == "backward":
+        return backward_difference(times, coords)
+    elif method == "central":
+        return central_difference(times, coords)
+    elif method == "savgol":
+        return savitzky_golay(times, coords, window, order)
+    raise ValueError(f"Unknown derivative method {method}, expected one of "
+                     f"{', '.join(DERIVATIVE_METHODS)}.")
+
+def backward_difference(times, coords):
+    velocity = np.diff(coords, axis=-1) / np.diff(times)
+    velocity_times = times[1:]
+    acceleration = np.diff(velocity, axis=-1) / np.diff(velocity_times)
+    return velocity_times, velocity, times[2:], acceleration
+
+def central_difference(times, coords):
+    '''Three point central difference on uneven time steps, exact for
+    quadratics.'''
+    before = times[1:-1] - times[:-2]
+    after = times[2:] - times[1:-1]
+    previous, current, following = (coords[..., :-2], coords[..., 1:-1],
+                                    coords[..., 2:])
+    denominator = before * after * (before + after)
+    velocity = (before ** 2 * following - after ** 2 * previous
+                + (after ** 2 - before ** 2) * current) / denominator
+    acceleration = 2 * (before * following - (before + after) * current
+                        + after * previous) / denominator
+    return times[1:-1], velocity, times[1:-1], acceleration
+
+def savitzky_golay(times, coords, window=DEFAULT_WINDOW, order=DEFAULT_ORDER):
+    '''Fits a polynomial of the given order to each window of samples by
+    least squares and differentiates it at the window's centre. Evenly
+    spaced samples share one set of filter coefficients, uneven ones get
+    a fit per window. Series shorter than the window, e.g. a short track,
+    fall back to the central difference.'''
+    if window % 2 == 0 or window <= order or order < 2:
+        raise ValueError("The Savitzky-Golay window must be odd and longer "
+                         "than the order, which must be at least 2.")
+    if times.shape[0] < window:
+        return central_difference(times, coords)
+    half = window // 2
+    centres = times[half:times.shape[0] - half]
+    # Offsets are measured in time steps to keep the fit well conditioned
+    step = np.median(np.diff(times))
+    powers = np.arange(order + 1)
+    steps = np.diff(times)
+    if np.allclose(steps, step, rtol=1e-6):
+        offsets = np.arange(-half, half + 1)
+        filters = np.linalg.pinv(offsets[:, None] ** powers)
+        fits = sliding_window_view(coords, window, axis=-1) @ filters.T
+    else:
+        offsets = (sliding_window_view(times, window) - centres[:, None]) / step
+        filters = np.linalg.pinv(offsets[..., None] ** powers)
+        fits = np.einsum("kpw,...kw->...kp", filters,
+                         sliding_window_view(coords, window, axis=-1))
+    velocity = fits[..., 1] / step
+    acceleration = 2 * fits[..., 2] / step ** 2
+    return centres, velocity, centres, acceleration
+
+def split_tracks(track_ids, *columns):
+    '''Splits long format columns into one set of columns per track, keeping
+    the row order within each track.
+
+    Return:
+        list: (track id, [column, ...]) ordered by track id.
+    '''
+    track_ids = np.asarray(track_ids)
+    order = np.argsort(track_ids, kind="stable")
+    ids, starts = np.unique(track_ids[order], return_index=True)
+    return [(track_id, [np.asarray(column)[rows] for column in columns])
+            for track_id, rows in zip(ids, np.split(order, starts[1:]))]
@@ -1,122 +1,388 @@
-import cv2, os, argparse, pathlib, sys, csv
-from tabulate import tabulate
+import cv2, os, sys, math
+import numpy as np
+from multiprocessing import Pool, shared_memory
 
-current_directory = os.path.dirname(sys.path[0])
-if current_directory not in sys.path:
-    sys.path.append(current_directory)
 from blob_detection_cli.blob_detection import setup_detector
+from extract_frame_cli.background import (DEFAULT_ALPHA, DEFAULT_SAMPLES, 
+                                          create_background_model)
+from extract_frame_cli.frame_store import frame_times, open_frames
+from get_positions_cli.get_positions_options import (DEFAULT_FORMATS,
+                                                     DEFAULT_LINK_DISTANCE,
+                                                     DEFAULT_MAX_MISSED,
+                                                     DEFAULT_SEARCH_RADIUS,
+                                                     init_argparse)
+from get_positions_cli.multi_tracking import link_tracks
+from get_positions_cli.tracking import PositionTracker
+from get_positions_cli.trajectory import (read_trajectory, trajectory_array, 
+                                          write_trajectory)
+from phystracker_cli.cache import (cached_result, invalidate, record_outputs,
+                                   stage_key, upstream_key)
+from phystracker_cli.events import ProgressReporter, report_failure
+
+# Extra pixels kept around the ROI so blobs on its edge are detected the
+# same way as on the full frame
+ROI_MARGIN = 50
+
+# Names of the trajectory files, one per format in data/
+POSITION_FILE = "position_data"
+# Written instead of POSITION_FILE in multi-object mode, one row per
+# detection with the id of the track it belongs to
+TRACK_FILE = "track_data"
+# Heading of each trajectory column in --table
+TABLE_HEADERS = {"Time": "Time (seconds)", "track": "Track", 
+                 "x": "x (meters)", "y": "y (meters)"}
+
+# State each process pool worker sets up once in _init_worker
+_worker = {}
 
 def get_positions(frames_path, frame_duration, roi, scale,
-                  avg_file_name="average.jpg", queue=None):
-    avg_background_path = str(frames_path.resolve()) + os.sep + avg_file_name
-    average_background = cv2.imread(avg_background_path)
+                  avg_file_name="average.jpg", queue=None, workers=1,
+                  background=None, samples=DEFAULT_SAMPLES, alpha=DEFAULT_ALPHA,
+                  progress="text", cache=True, track=False,
+                  search_radius=DEFAULT_SEARCH_RADIUS, detector_type="blob",
+                  multi=False, link_distance=DEFAULT_LINK_DISTANCE,
+                  max_missed=DEFAULT_MAX_MISSED, formats=DEFAULT_FORMATS,
+                  table=False, gray=False):
+    '''Finds the object in every frame and writes its positions to 
+    data/position_data.csv and the other formats requested.
+
+    Parameters:
+        background(str): Background model computed from the frames, one of
+            BACKGROUND_MODELS. If None, avg_file_name is used.
+        samples(int): Frames sampled by the median and ema models.
+        alpha(float): Weight of each new frame in the ema model.
+        progress(str): Progress printed to stdout, see ProgressReporter.
+        cache(bool): Reuse position_data.csv when it was made from the same
+            frames and options, see phystracker_cli.cache.
+        track(bool): Follow the object with a PositionTracker and only
+            search a window around its predicted position.
+        search_radius(int): Half the side of the tracking window.
+        detector_type(str): Blob detector backend, one of DETECTORS.
+        multi(bool): Keep every object in each frame, link them into tracks
+            with a MultiTracker and write data/track_data.csv instead.
+        link_distance(float): Largest distance in pixels an object moves
+            between frames in multi mode.
+        max_missed(int): Frames a track may go undetected in multi mode.
+        formats(tuple): Trajectory formats written, see TRAJECTORY_FORMATS.
+        table(bool): Print every position as a table in text mode.
+        gray(bool): Read frames and background as single channel images.
+    '''
+    if multi and track:
+        raise ValueError("Tracking follows a single object, it can't be "
+                         "combined with multi-object mode.")
+    if workers > 1 and (background == "ema" or track or multi):
+        raise ValueError("The ema background and tracking need frames "
+                         "in order, they can't be used with more than "
+                         "one worker.")
     input_path = str(frames_path.resolve())
-    img_paths = os.listdir(input_path)
+    file_name = TRACK_FILE if multi else POSITION_FILE
+    reporter = ProgressReporter("get_positions", queue, progress)
+    key = None
+    frames_key = upstream_key(input_path, "extract_frame")
+    if cache and frames_key is not None:
+        key = stage_key("get_positions", {
+            "frame_duration": frame_duration, "roi": list(roi), 
+            "scale": scale, "avg_file_name": avg_file_name, 
+            "background": background, "samples": samples, "alpha": alpha,
+            "track": track, "search_radius": search_radius if track else None,
+            "detector": detector_type, "multi": multi,
+            "link_distance": link_distance if multi else None,
+            "max_missed": max_missed if multi else None,
+            "formats": sorted(formats), "gray": gray}, 
+            [frames_key])
+        result = cached_result(input_path, "get_positions", key)
+        if result is not None:
+            reporter.start()
+            if table and progress == "text":
+                print_table(trajectory_array(
+                    **read_trajectory(result["files"][0])))
+            reporter.finish(cached=True, **result)
+            return
+    invalidate(input_path, "get_positions")
+
+    frames = open_frames(input_path, avg_file_name, gray)
+
+    background_model = None
+    if background is None:
+        average_background = frames.background()
+    else:
+        background_model = create_background_model(background, frames=frames,
+                                                    samples=samples, 
+                                                    alpha=alpha)
+        if background == "mean":
+            for img in frames:
+                background_model.update(img)
+        average_background = background_model.get()
+
+    # Only the region around the ROI is processed
+    window = roi_window(roi, average_background.shape, ROI_MARGIN)
+    background_window = crop_to_window(average_background, window)
+
+    reporter.start(len(frames))
+    if workers > 1:
+        positions = detect_positions_parallel(input_path, avg_file_name, 
+                                              len(frames), background_window,
+                                              window, roi, workers, reporter,
+                                              detector_type, gray)
+    else:
+        positions = []
+        detector = setup_position_detector(detector_type)
+        tracker = PositionTracker(window, search_radius) if track else None
+        for count, img in enumerate(frames):
+            if background == "ema":
+                average_background = background_model.get()
+                background_window = crop_to_window(average_background, window)
+                background_model.update(img)
+            if multi:
+                positions.append(detect_all_positions_in_window(
+                    crop_to_window(img, window), background_window, window, 
+                    roi, detector))
+            elif tracker is not None:
+                positions.append(track_position(img, average_background, 
+                                                tracker, roi, detector))
+            else:
+                positions.append(detect_position_in_window(
+                    crop_to_window(img, window), background_window, window, 
+                    roi, detector))
+            reporter.update(count + 1)
 
-    x_coords = []
-    y_coords = []
     image_height = average_background.shape[0]
+    # Each position is timed by its own frame, so frames where nothing was
+    # detected don't shift the later times
+    times = frame_times(frames.timestamps, frame_duration, len(frames))
+    if multi:
+        links = np.array(link_tracks(positions, link_distance, max_missed),
+                         dtype=float).reshape(-1, 4)
+        trajectory = trajectory_array(
+            Time=times[links[:, 0].astype(int)], track=links[:, 1], 
+            x=links[:, 2] * scale, y=(image_height - links[:, 3]) * scale)
+    else:
+        detected = [i for i, position in enumerate(positions) 
+                    if position is not None]
+        found = np.array([positions[i] for i in detected], 
+                         dtype=float).reshape(-1, 2)
+        trajectory = trajectory_array(
+            Time=times[detected], x=found[:, 0] * scale,
+            y=(image_height - found[:, 1]) * scale)
 
-    count = 0
-    for path in img_paths:
-        name, ext = os.path.splitext(path)
-        if ext.lower() not in ('.jpg', '.png'):
-            continue
-        img = cv2.imread(f"{input_path}{os.sep}{path}")
-        difference = cv2.absdiff(img, average_background)
-        difference = cv2.cvtColor(difference, cv2.COLOR_BGR2GRAY)
-        f_, thresholded_diff = cv2.threshold(difference, 15, 255, 
-                                             cv2.THRESH_BINARY)
-
-        detector = setup_detector(min_area=200, max_area=2000, circularity=0.3, 
-                                  convexity=0.1, inertia=0.01)
-        keypoints = detector.detect(thresholded_diff)
-
-        max_area = 0
-        max_area_point = None
-        for key_point in keypoints:
-            x = key_point.pt[0]
-            y = key_point.pt[1]
-            size = key_point.size
-
-            roi_x = roi[0]
-            roi_y = roi[1]
-            roi_w = roi[2]
-            roi_h = roi[3]
-
-            if (roi_x < x < roi_x + roi_w) and (roi_y < y < roi_y + roi_h):
-                if size > max_area:
-                    max_area_point = key_point
-        if max_area_point is not None:
-            x_coords.append(max_area_point.pt[0] * scale)
-            y_coords.append((image_height - max_area_point.pt[1]) * scale)
-            progress_msg = f"Progress: {count}/{len(img_paths) - 1}"
-            if queue is not None:
-                queue.put(progress_msg)
-            print(progress_msg, flush=True)
-        count += 1
-
-    header = ["Time (seconds)", "x (meters)", "y (meters)"]
-    rows = []
-
-    for i in range(len(x_coords)):
-        rows.append([i * frame_duration, x_coords[i], y_coords[i]])
-
-    table = tabulate(rows, header, tablefmt="grid")
-    print(table, file=sys.stdout)
-
-    output_path = f"{input_path}{os.sep}data"
-    if not os.path.exists(output_path):
-        os.mkdir(output_path)
-
-    with open(f"{output_path}{os.sep}position_data.csv", "w", newline="") as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(["Time", "x", "y"])
-        writer.writerows(rows)
-    if queue is not None:
-        queue.put("Process successful")
-    print("Process successful", flush=True)
+    if table and progress == "text":
+        print_table(trajectory)
+
+    data_path = os.path.join(input_path, "data")
+    written = [os.path.join("data", written_name) for written_name in 
+               write_trajectory(trajectory, data_path, file_name, formats)]
+    result = {"files": [os.path.join(input_path, path) for path in written],
+              "positions": len(trajectory), "frames": len(frames)}
+    if "csv" in formats:
+        result["csv"] = os.path.join(data_path, f"{file_name}.csv")
+    if multi:
+        result["tracks"] = len(np.unique(trajectory["track"]))
+    if key is not None:
+        record_outputs(input_path, "get_positions", key, written, result)
+    reporter.finish(**result)
     
-def tuple_type(strings):
-    strings = strings.replace("(", "").replace(")", "")
-    mapped_int = map(int, strings.split(","))
-    return tuple(mapped_int)
-
-def init_argparse() -> argparse.ArgumentParser:
-    parser = argparse.ArgumentParser(prog=sys.argv[0],
-        usage="%(prog)s [-h] [-v] -i INPUT_PATH -f frame_duration -r ROI -m M_PER_PIXEL", 
-        add_help=False, description="Converts mp4 video into photo")
-
-    required = parser.add_argument_group('required arguments')
-    required.add_argument("-i", "--inpath", action="store", type=pathlib.Path, 
-                          required=True, help = "Full path to directory containing frames")
-    required.add_argument("-d", "--duration_frame", action="store", type=float,
-                          required=True, help = "Duration of time apart of each frame in seconds")
-    required.add_argument("-r", "--roi", action="store", type=tuple_type,
-                          required=True, help = "Region of interest coordinates as tuple (x,y,w,h)")
-    required.add_argument("-m", "--meter_per_pixel", action="store", type=float, 
-                          required=True, help = "Meter per pixel conversion factor")
-
-    optional = parser.add_argument_group('optional arguments')
-    optional.add_argument("-h", "--help", action="help", 
-                          help="show this help message and exit")
-    optional.add_argument("-v", "--version", action="version", 
-                        version=f"{parser.prog} version 1.0.0")
-    optional.add_argument("-a", "--avg_img", action="store", type=str, 
-                          default="average.jpg",
-                          help = "Name of average image that will be used as base comparison")
-    return parser
-
-
-def main() -> None:
-    parser = init_argparse()
-    args = parser.parse_args()
+def print_table(trajectory):
+    '''Prints every row of a trajectory as a grid.'''
+    # Imported here, it is slow to import and only needed for the table
+    from tabulate import tabulate
+    header = [TABLE_HEADERS[column] for column in trajectory.dtype.names]
+    print(tabulate(trajectory.tolist(), header, tablefmt="grid"), 
+          file=sys.stdout)
+
+def setup_position_detector(detector_type="blob"):
+    return setup_detector(min_area=200, max_area=2000, circularity=0.3, 
+                          convexity=0.1, inertia=0.01, 
+                          detector_type=detector_type)
+
+def detect_position(img, average_background, roi, detector, near=None):
+    '''Finds the tracked object in a frame by comparing it against the
+    average background.
+
+    Parameters:
+        img(ndarray): Frame to search.
+        average_background(ndarray): Background of the same size as img.
+        roi(tuple): Region (x, y, w, h) the object must be inside.
+        detector: Blob detector created by setup_position_detector.
+        near(tuple): Expected (x, y) position. If given, the blob closest
+            to it is returned, otherwise the largest blob.
+
+    Return:
+        tuple: (x, y) pixel position of the object, None if not found.
+    '''
+    best_score = None
+    best_point = None
+    for key_point in find_keypoints(img, average_background, roi, detector):
+        if near is not None:
+            score = -math.dist(key_point.pt, near)
+        else:
+            score = key_point.size
+        if best_score is None or score > best_score:
+            best_score = score
+            best_point = key_point
+    if best_point is None:
+        return None
+    return best_point.pt
+
+def find_keypoints(img, average_background, roi, detector):
+    '''Detects every blob that differs from the background inside roi.
+
+    Return:
+        list: cv2.KeyPoint for each blob.
+    '''
+    difference = cv2.absdiff(img, average_background)
+    if difference.ndim == 3:
+        difference = cv2.cvtColor(difference, cv2.COLOR_BGR2GRAY)
+    f_, thresholded_diff = cv2.threshold(difference, 15, 255, 
+                                         cv2.THRESH_BINARY)
+    keypoints = detector.detect(thresholded_diff)
+
+    roi_x, roi_y, roi_w, roi_h = roi
+    return [key_point for key_point in keypoints
+            if (roi_x < key_point.pt[0] < roi_x + roi_w) 
+            and (roi_y < key_point.pt[1] < roi_y + roi_h)]
+
+def detect_positions_parallel(frames_path, avg_file_name, frame_count, 
+                              background_window, window, roi, workers, 
+                              reporter, detector_type="blob", gray=False):
+    '''Detects the object in every frame across a pool of processes. Each
+    worker builds its detector once and reads the background, cropped to
+    window, from shared memory.
+
+    Return:
+        list: (x, y) position or None for each frame, in frame order.
+    '''
+    chunk_size = max(1, math.ceil(frame_count / (workers * 4)))
+    chunks = [range(i, min(i + chunk_size, frame_count)) 
+              for i in range(0, frame_count, chunk_size)]
+
+    shm = shared_memory.SharedMemory(create=True, 
+                                     size=background_window.nbytes)
+    try:
+        shared_background = np.ndarray(background_window.shape, 
+                                       dtype=background_window.dtype, 
+                                       buffer=shm.buf)
+        shared_background[:] = background_window
+        init_args = (shm.name, background_window.shape, 
+                     background_window.dtype, window, roi, frames_path, 
+                     avg_file_name, detector_type, gray)
+        positions = []
+        with Pool(workers, initializer=_init_worker, initargs=init_args) as pool:
+            for chunk_positions in pool.imap(_detect_chunk, chunks):
+                positions.extend(chunk_positions)
+                reporter.update(len(positions))
+        del shared_background
+    finally:
+        shm.close()
+        shm.unlink()
+    return positions
+
+def _init_worker(shm_name, shape, dtype, window, roi, frames_path, 
+                 avg_file_name, detector_type, gray):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    background = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    background.flags.writeable = False
+    _worker["shm"] = shm
+    _worker["background"] = background
+    _worker["window"] = window
+    _worker["roi"] = roi
+    _worker["detector"] = setup_position_detector(detector_type)
+    _worker["frames"] = open_frames(frames_path, avg_file_name, gray)
+
+def _detect_chunk(indices):
+    positions = []
+    for i in indices:
+        img = crop_to_window(_worker["frames"][i], _worker["window"])
+        positions.append(detect_position_in_window(
+            img, _worker["background"], _worker["window"], _worker["roi"], 
+            _worker["detector"]))
+    return positions
+
+def roi_window(roi, image_shape, margin):
+    '''Expands roi by margin pixels on every side, clipped to the image.
+
+    Return:
+        tuple: (x0, y0, x1, y1) bounds of the window.
+    '''
+    x, y, w, h = roi
+    image_height, image_width = image_shape[:2]
+    return (max(x - margin, 0), max(y - margin, 0),
+            min(x + w + margin, image_width), min(y + h + margin, image_height))
+
+def crop_to_window(image, window):
+    x0, y0, x1, y1 = window
+    return image[y0:y1, x0:x1]
+
+def detect_position_in_window(img, background_window, window, roi, detector,
+                              near=None):
+    '''Runs detect_position on a frame and background already cropped to
+    window. roi and near are in full frame coordinates.
+
+    Return:
+        tuple: (x, y) position in full frame coordinates, None if not found.
+    '''
+    x0, y0 = window[0], window[1]
+    window_roi = (roi[0] - x0, roi[1] - y0, roi[2], roi[3])
+    if near is not None:
+        near = (near[0] - x0, near[1] - y0)
+    position = detect_position(img, background_window, window_roi, detector,
+                               near)
+    if position is None:
+        return None
+    return (position[0] + x0, position[1] + y0)
+
+def detect_all_positions_in_window(img, background_window, window, roi, 
+                                   detector):
+    '''Like detect_position_in_window, but returns every object found.
+
+    Return:
+        list: (x, y) positions in full frame coordinates.
+    '''
+    x0, y0 = window[0], window[1]
+    window_roi = (roi[0] - x0, roi[1] - y0, roi[2], roi[3])
+    return [(key_point.pt[0] + x0, key_point.pt[1] + y0) 
+            for key_point in find_keypoints(img, background_window, 
+                                            window_roi, detector)]
+
+def track_position(img, background, tracker, roi, detector):
+    '''Detects the object inside the window the tracker predicts, widening
+    the window until it is found, and updates the tracker with the result.
+
+    Parameters:
+        img(ndarray): Full frame.
+        background(ndarray): Full frame background.
+        tracker(PositionTracker): Tracker following the object.
+
+    Return:
+        tuple: (x, y) position in full frame coordinates, None if not found.
+    '''
+    near = tracker.predict()
+    while True:
+        search = tracker.search_window()
+        position = detect_position_in_window(crop_to_window(img, search),
+                                             crop_to_window(background, search),
+                                             search, roi, detector, near)
+        if position is not None or not tracker.widen():
+            break
+    tracker.update(position)
+    return position
+
+def main(argv=None, prog=None) -> None:
+    parser = init_argparse(prog)
+    args = parser.parse_args(argv)
     try:
         get_positions(args.inpath, args.duration_frame, 
-                      args.roi, args.meter_per_pixel, args.avg_img)
+                      args.roi, args.meter_per_pixel, args.avg_img, 
+                      workers=args.workers, background=args.background,
+                      samples=args.samples, alpha=args.alpha,
+                      progress=args.progress, cache=args.cache,
+                      track=args.track, search_radius=args.search_radius,
+                      detector_type=args.detector, multi=args.multi,
+                      link_distance=args.link_distance, 
+                      max_missed=args.max_missed, formats=args.formats,
+                      table=args.table, gray=args.gray)
         exit(0)
     except Exception as err:
-        print(err, file=sys.stderr)
+        report_failure("get_positions", err, progress=args.progress)
         exit(1)
 
 if __name__ == "__main__":
@@ -0,0 +1,103 @@
+import sys, argparse, pathlib
+
+from blob_detection_cli.blob_detection_options import DETECTORS
+from extract_frame_cli.extract_frame_options import (BACKGROUND_MODELS, 
+                                                     DEFAULT_ALPHA, 
+                                                     DEFAULT_SAMPLES)
+from phystracker_cli.events import PROGRESS_FORMATS
+
+# The command line options of get_positions and the defaults they share with
+# the other stages. Kept free of cv2 and numpy, so phystracker can print help
+# and reject bad arguments before importing the stage.
+
+# Half the side of the search window around the predicted position, in
+# pixels, allowing for prediction error. The tracker adds a margin for the
+# object's own size on top.
+DEFAULT_SEARCH_RADIUS = 60
+
+# Largest distance in pixels a detection may be from a track's predicted
+# position to continue that track
+DEFAULT_LINK_DISTANCE = 50
+# Frames a track survives without detections before it is ended
+DEFAULT_MAX_MISSED = 5
+
+# csv: text, readable anywhere
+# npy: NumPy structured array, memory mapped when read
+# parquet: columnar, needs pyarrow
+TRAJECTORY_FORMATS = ("csv", "npy", "parquet")
+DEFAULT_FORMATS = ("csv", "npy")
+
+def tuple_type(strings):
+    strings = strings.replace("(", "").replace(")", "")
+    mapped_int = map(int, strings.split(","))
+    return tuple(mapped_int)
+
+def init_argparse(prog=None) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog=prog or sys.argv[0],
+        usage="%(prog)s [-h] [-v] -i INPUT_PATH -f frame_duration -r ROI -m M_PER_PIXEL [-w WORKERS] [-b MODEL] [-t | --multi] [--detector TYPE] [--format FORMAT ...] [--table] [--gray] [--progress FORMAT] [--no-cache]", 
+        add_help=False, description="Converts mp4 video into photo")
+
+    required = parser.add_argument_group('required arguments')
+    required.add_argument("-i", "--inpath", action="store", type=pathlib.Path, 
+                          required=True, help = "Full path to directory containing frames or a frame store")
+    required.add_argument("-d", "--duration_frame", action="store", type=float,
+                          required=True, help = """Duration of time apart of each frame in seconds, \
+                          used when the frames have no timestamps""")
+    required.add_argument("-r", "--roi", action="store", type=tuple_type,
+                          required=True, help = "Region of interest coordinates as tuple (x,y,w,h)")
+    required.add_argument("-m", "--meter_per_pixel", action="store", type=float, 
+                          required=True, help = "Meter per pixel conversion factor")
+
+    optional = parser.add_argument_group('optional arguments')
+    optional.add_argument("-h", "--help", action="help", 
+                          help="show this help message and exit")
+    optional.add_argument("-v", "--version", action="version", 
+                        version=f"{parser.prog} version 1.0.0")
+    optional.add_argument("-a", "--avg_img", action="store", type=str, 
+                          default="average.jpg",
+                          help = "Name of average image that will be used as base comparison")
+    optional.add_argument("-w", "--workers", action="store", type=int, default=1,
+                          help = "Number of processes used to detect positions")
+    optional.add_argument("-b", "--background", choices=BACKGROUND_MODELS, 
+                          help = """Compute the background from the frames \
+                          instead of reading the average image""")
+    optional.add_argument("--samples", action="store", type=int, 
+                          default=DEFAULT_SAMPLES, 
+                          help = "Frames sampled for the median and ema background")
+    optional.add_argument("--alpha", action="store", type=float, 
+                          default=DEFAULT_ALPHA, 
+                          help = "Weight of each frame in the ema background")
+    optional.add_argument("-t", "--track", action="store_true",
+                          help = """Predict the object's motion and only search \
+                          a window around the predicted position""")
+    optional.add_argument("--search_radius", action="store", type=int,
+                          default=DEFAULT_SEARCH_RADIUS,
+                          help = """Half the side of the tracking window in pixels, \
+                          before a margin for the object's size is added""")
+    optional.add_argument("--multi", action="store_true",
+                          help = """Track every object, writing data/track_data.csv \
+                          with a track id on each row""")
+    optional.add_argument("--link_distance", action="store", type=float,
+                          default=DEFAULT_LINK_DISTANCE,
+                          help = "Largest distance in pixels an object moves between frames in --multi mode")
+    optional.add_argument("--max_missed", action="store", type=int,
+                          default=DEFAULT_MAX_MISSED,
+                          help = "Frames a track may go undetected in --multi mode")
+    optional.add_argument("--format", dest="formats", nargs="+", 
+                          choices=TRAJECTORY_FORMATS, default=list(DEFAULT_FORMATS),
+                          help = """Formats the positions are written in: csv, npy \
+                          (NumPy structured array) and parquet (needs pyarrow)""")
+    optional.add_argument("--table", action="store_true",
+                          help = "Print every position as a table")
+    optional.add_argument("--gray", action="store_true",
+                          help = """Read frames and background as grayscale and \
+                          diff single channel images""")
+    optional.add_argument("--detector", choices=DETECTORS, default="blob",
+                          help = """Blob detector: OpenCV's SimpleBlobDetector or \
+                          a faster connected components detector""")
+    optional.add_argument("--progress", choices=PROGRESS_FORMATS, default="text",
+                          help = "Print progress as text or as one JSON event per line")
+    optional.add_argument("--no-cache", dest="cache", action="store_false",
+                          help = """Detect again even if position_data.csv was \
+                          made from the same frames and options""")
+    return parser
@@ -0,0 +1,210 @@
+import math
+import numpy as np
+
+from get_positions_cli.get_positions_options import (DEFAULT_LINK_DISTANCE,
+                                                     DEFAULT_MAX_MISSED)
+
+class Track:
+    def __init__(self, track_id, position):
+        self.id = track_id
+        self.position = position
+        self.velocity = (0.0, 0.0)
+        self.missed = 0
+
+    def predict(self):
+        steps = self.missed + 1
+        return (self.position[0] + self.velocity[0] * steps,
+                self.position[1] + self.velocity[1] * steps)
+
+    def update(self, position):
+        steps = self.missed + 1
+        self.velocity = ((position[0] - self.position[0]) / steps,
+                         (position[1] - self.position[1]) / steps)
+        self.position = position
+        self.missed = 0
+
+class MultiTracker:
+    '''Links detections across frames into tracks with persistent ids.
+
+    Each track predicts its next position at constant velocity. Candidate
+    pairs within link_distance are found with a grid of link_distance
+    sized cells, so only nearby detections are compared. The candidate
+    pairs split into independent groups, and each group is solved
+    optimally with the Hungarian algorithm. Work stays close to linear in
+    the number of objects while they are spread out.
+
+    Parameters:
+        link_distance(float): Largest distance in pixels between a
+            prediction and the detection continuing it.
+        max_missed(int): Frames a track may go undetected before it ends.
+    '''
+    def __init__(self, link_distance=DEFAULT_LINK_DISTANCE,
+                 max_missed=DEFAULT_MAX_MISSED):
+        self.link_distance = link_distance
+        self.max_missed = max_missed
+        self.tracks = []
+        self.next_id = 0
+
+    def update(self, detections):
+        '''Assigns this frame's detections to tracks.
+
+        Parameters:
+            detections(list): (x, y) positions found in the frame.
+
+        Return:
+            list: (track id, (x, y)) for every detection.
+        '''
+        predictions = [track.predict() for track in self.tracks]
+        pairs = candidate_pairs(predictions, detections, self.link_distance)
+        matches = {}
+        for group in connected_groups(pairs, len(predictions)):
+            matches.update(assign(group, predictions, detections))
+
+        assigned = []
+        matched_tracks = set()
+        for detection_index, position in enumerate(detections):
+            track_index = matches.get(detection_index)
+            if track_index is None:
+                track = Track(self.next_id, position)
+                self.next_id += 1
+                self.tracks.append(track)
+            else:
+                track = self.tracks[track_index]
+                track.update(position)
+            matched_tracks.add(track.id)
+            assigned.append((track.id, position))
+
+        for track in self.tracks:
+            if track.id not in matched_tracks:
+                track.missed += 1
+        self.tracks = [track for track in self.tracks
+                       if track.missed <= self.max_missed]
+        return assigned
+
+def link_tracks(frame_detections, link_distance=DEFAULT_LINK_DISTANCE,
+                max_missed=DEFAULT_MAX_MISSED):
+    '''Runs a MultiTracker over every frame.
+
+    Return:
+        list: (frame index, track id, x, y) rows ordered by frame.
+    '''
+    tracker = MultiTracker(link_distance, max_missed)
+    rows = []
+    for frame, detections in enumerate(frame_detections):
+        for track_id, (x, y) in tracker.update(detections):
+            rows.append((frame, track_id, x, y))
+    return rows
+
+def candidate_pairs(predictions, detections, link_distance):
+    '''Finds (track, detection, distance) pairs within link_distance with a
+    uniform grid over the detections.'''
+    grid = {}
+    for index, (x, y) in enumerate(detections):
+        cell = (math.floor(x / link_distance), math.floor(y / link_distance))
+        grid.setdefault(cell, []).append(index)
+
+    pairs = []
+    for track_index, (x, y) in enumerate(predictions):
+        cell_x = math.floor(x / link_distance)
+        cell_y = math.floor(y / link_distance)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for index in grid.get((cell_x + dx, cell_y + dy), ()):
+                    distance = math.dist((x, y), detections[index])
+                    if distance <= link_distance:
+                        pairs.append((track_index, index, distance))
+    return pairs
+
+def connected_groups(pairs, track_count):
+    '''Splits candidate pairs into groups that share no track or
+    detection, which can be assigned independently.'''
+    # Union-find over tracks (0..track_count-1) and detections after them
+    parent = {}
+    def find(node):
+        root = node
+        while parent.setdefault(root, root) != root:
+            root = parent[root]
+        while parent[node] != root:
+            parent[node], node = root, parent[node]
+        return root
+
+    for track_index, detection_index, _ in pairs:
+        parent[find(track_index)] = find(track_count + detection_index)
+
+    groups = {}
+    for pair in pairs:
+        groups.setdefault(find(pair[0]), []).append(pair)
+    return list(groups.values())
+
+def assign(pairs, predictions, detections):
+    '''Minimum total distance assignment within one group of pairs.
+
+    Return:
+        dict: Track index for each assigned detection index.
+    '''
+    if len(pairs) == 1:
+        return {pairs[0][1]: pairs[0][0]}
+    tracks = sorted({pair[0] for pair in pairs})
+    found = sorted({pair[1] for pair in pairs})
+    row = {track: i for i, track in enumerate(tracks)}
+    column = {detection: j for j, detection in enumerate(found)}
+    # Pairs that aren't candidates get a cost no real pair can reach
+    impossible = 1 + sum(pair[2] for pair in pairs)
+    cost = np.full((len(tracks), len(found)), impossible)
+    for track_index, detection_index, distance in pairs:
+        cost[row[track_index], column[detection_index]] = distance
+
+    matches = {}
+    for i, j in hungarian(cost):
+        if cost[i, j] < impossible:
+            matches[found[j]] = tracks[i]
+    return matches
+
+def hungarian(cost):
+    '''Solves the rectangular assignment problem with the Hungarian
+    algorithm (shortest augmenting paths with potentials), O(n²m).
+
+    Return:
+        list: (row, column) pairs, one per row or column, whichever is
+        fewer.
+    '''
+    transposed = cost.shape[0] > cost.shape[1]
+    if transposed:
+        cost = cost.T
+    n, m = cost.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    # match[j] is the row assigned to column j (1-based, 0 = none)
+    match = np.zeros(m + 1, dtype=int)
+    way = np.zeros(m + 1, dtype=int)
+    for i in range(1, n + 1):
+        match[0] = i
+        j0 = 0
+        min_value = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = match[j0]
+            reduced = cost[i0 - 1] - u[i0] - v[1:]
+            free = ~used[1:]
+            better = free & (reduced < min_value[1:])
+            min_value[1:][better] = reduced[better]
+            way[1:][better] = j0
+            candidates = np.where(free, min_value[1:], np.inf)
+            j1 = int(np.argmin(candidates)) + 1
+            delta = candidates[j1 - 1]
+            u[match[used]] += delta
+            v[used] -= delta
+            min_value[1:][free] -= delta
+            j0 = j1
+            if match[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            match[j0] = match[j1]
+            j0 = j1
+
+    pairs = [(match[j] - 1, j - 1) for j in range(1, m + 1) if match[j]]
+    if transposed:
+        pairs = [(j, i) for i, j in pairs]
+    return pairs
@@ -0,0 +1,101 @@
+import cv2
+import numpy as np
+
+from get_positions_cli.get_positions_options import DEFAULT_SEARCH_RADIUS
+
+# Extra pixels around the search window, so an object whose centre is near
+# the window's edge isn't cut off, which would pull its centroid inwards.
+# At least the radius of the largest object setup_position_detector accepts
+# (2000 px², about 25 px).
+SEARCH_MARGIN = 30
+
+class PositionTracker:
+    '''Follows the object with a constant-acceleration Kalman filter and
+    limits detection to a window around the predicted position. When the
+    object isn't found the window is doubled with widen() and searched
+    again, up to the whole search area. The window shrinks back after the
+    next detection. Until the first detection the whole area is searched.
+
+    Parameters:
+        bounds(tuple): (x0, y0, x1, y1) area the window stays inside,
+            normally the ROI window.
+        search_radius(int): Half the side of the window after a detection,
+            before margin is added.
+        margin(int): Pixels added on every side of the window.
+    '''
+    def __init__(self, bounds, search_radius=DEFAULT_SEARCH_RADIUS,
+                 margin=SEARCH_MARGIN):
+        self.bounds = bounds
+        self.search_radius = search_radius
+        self.margin = margin
+        self.misses = 0
+        self.prediction = None
+        self.kalman = None
+
+    def predict(self):
+        '''Advances the filter by one frame.
+
+        Return:
+            tuple: Predicted (x, y), None before the first detection.
+        '''
+        if self.kalman is not None:
+            state = self.kalman.predict()
+            self.prediction = (float(state[0, 0]), float(state[1, 0]))
+        return self.prediction
+
+    def search_window(self):
+        if self.prediction is None:
+            return self.bounds
+        radius = self.search_radius * 2 ** min(self.misses, 16) + self.margin
+        x0, y0, x1, y1 = self.bounds
+        if 2 * radius >= max(x1 - x0, y1 - y0):
+            return self.bounds
+        # A prediction that left the area is pulled back onto its edge
+        x = min(max(self.prediction[0], x0), x1)
+        y = min(max(self.prediction[1], y0), y1)
+        return (max(int(x - radius), x0), max(int(y - radius), y0),
+                min(int(x + radius) + 1, x1), min(int(y + radius) + 1, y1))
+
+    def widen(self):
+        '''Doubles the search window.
+
+        Return:
+            bool: False if the window already covers the whole area.
+        '''
+        if self.search_window() == self.bounds:
+            return False
+        self.misses += 1
+        return True
+
+    def update(self, position):
+        '''Corrects the filter with the position found in this frame. If
+        the object wasn't found the filter keeps its prediction.'''
+        if position is None:
+            return
+        self.misses = 0
+        measurement = np.array([[position[0]], [position[1]]], np.float32)
+        if self.kalman is None:
+            self.kalman = create_kalman_filter(position)
+        else:
+            self.kalman.correct(measurement)
+        self.prediction = position
+
+def create_kalman_filter(position):
+    '''Kalman filter over (x, y, vx, vy, ax, ay) with one frame per step,
+    measuring (x, y).'''
+    kalman = cv2.KalmanFilter(6, 2)
+    kalman.transitionMatrix = np.array([
+        [1, 0, 1, 0, 0.5, 0],
+        [0, 1, 0, 1, 0, 0.5],
+        [0, 0, 1, 0, 1, 0],
+        [0, 0, 0, 1, 0, 1],
+        [0, 0, 0, 0, 1, 0],
+        [0, 0, 0, 0, 0, 1]], np.float32)
+    kalman.measurementMatrix = np.eye(2, 6, dtype=np.float32)
+    kalman.processNoiseCov = np.eye(6, dtype=np.float32) * 1e-2
+    kalman.measurementNoiseCov = np.eye(2, dtype=np.float32)
+    # Velocity and acceleration are unknown at the first detection
+    kalman.errorCovPost = np.diag([1, 1, 1e3, 1e3, 1e2, 1e2]).astype(np.float32)
+    kalman.statePost = np.array([[position[0]], [position[1]], [0], [0],
+                                 [0], [0]], np.float32)
+    return kalman
@@ -0,0 +1,86 @@
+import os, csv
+import numpy as np
+
+from get_positions_cli.get_positions_options import DEFAULT_FORMATS
+
+def trajectory_array(**columns):
+    '''Structured array with one field per column, in the order given.
+    The track column holds integers, the others floats.'''
+    dtype = [(name, np.int64 if name == "track" else np.float64)
+             for name in columns]
+    length = len(next(iter(columns.values()))) if columns else 0
+    trajectory = np.empty(length, dtype=dtype)
+    for name, values in columns.items():
+        trajectory[name] = values
+    return trajectory
+
+def write_trajectory(trajectory, output_path, name,
+                     formats=DEFAULT_FORMATS):
+    '''Writes a trajectory to output_path/name.<format> for each format.
+
+    Parameters:
+        trajectory(array): Structured array, see trajectory_array.
+        output_path(str): Directory, created if it doesn't exist.
+        name(str): File name without the extension.
+        formats(tuple): Some of TRAJECTORY_FORMATS.
+
+    Return:
+        list: Names of the files written.
+    '''
+    os.makedirs(output_path, exist_ok=True)
+    written = []
+    for trajectory_format in formats:
+        file_name = f"{name}.{trajectory_format}"
+        path = os.path.join(output_path, file_name)
+        if trajectory_format == "csv":
+            with open(path, "w", newline="") as csvfile:
+                writer = csv.writer(csvfile)
+                writer.writerow(trajectory.dtype.names)
+                writer.writerows(trajectory.tolist())
+        elif trajectory_format == "npy":
+            np.save(path, trajectory)
+        elif trajectory_format == "parquet":
+            pyarrow, parquet = import_pyarrow()
+            parquet.write_table(pyarrow.table(
+                {column: trajectory[column] for column in trajectory.dtype.names}),
+                path)
+        else:
+            raise ValueError(f"Unknown trajectory format {trajectory_format}.")
+        written.append(file_name)
+    return written
+
+def read_trajectory(path):
+    '''Reads a trajectory written by write_trajectory. A .npy file is
+    memory mapped and a .parquet file read through a memory map, so the
+    columns returned are views of the file rather than copies. CSV files
+    with a header row are parsed.
+
+    Return:
+        dict: Column name to array of values.
+    '''
+    path = str(path)
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".npy":
+        trajectory = np.load(path, mmap_mode="r")
+        return {name: trajectory[name] for name in trajectory.dtype.names}
+    elif extension == ".parquet":
+        _, parquet = import_pyarrow()
+        table = parquet.read_table(path, memory_map=True)
+        return {name: table.column(name).to_numpy()
+                for name in table.column_names}
+    with open(path) as file:
+        names = file.readline().strip().split(",")
+        values = np.loadtxt(file, delimiter=",", ndmin=2)
+    if values.size == 0:
+        values = np.empty((0, len(names)))
+    return {name: values[:, i] for i, name in enumerate(names)}
+
+def import_pyarrow():
+    # pyarrow is optional and slow to import, so only imported for parquet
+    try:
+        import pyarrow
+        import pyarrow.parquet as parquet
+    except ImportError:
+        raise ValueError("The parquet format needs pyarrow, install it or "
+                         "use csv or npy.")
+    return pyarrow, parquet
@@ -11,6 +11,7 @@ from gui_pages.page2 import Page2
 from gui_pages.page3 import Page3
 from gui_pages.page4 import Page4
 from gui_pages.page5 import Page5
+from worker_pool import WorkerPool
 
 class MainApplication(tk.Frame):
     def __init__(self, parent):
@@ -21,11 +22,17 @@ class MainApplication(tk.Frame):
         self.menubar = MenuBar(self)
         self.buttons = BottomButtons(self, self.prev, self.next)
         self.vid_manager = VideoManager((width, height))
+        # Shared by the processing pages, started now so the workers are
+        # ready by the time a video is chosen
+        self.worker_pool = WorkerPool(self)
 
         self.page1 = Page1(self, self.buttons, self.vid_manager)
-        self.page2 = Page2(self, self.buttons, self.vid_manager)
-        self.page3 = Page3(self, self.buttons, self.vid_manager)
-        self.page4 = Page4(self, self.buttons, self.vid_manager)
+        self.page2 = Page2(self, self.buttons, self.vid_manager, 
+                           self.worker_pool)
+        self.page3 = Page3(self, self.buttons, self.vid_manager, 
+                           self.worker_pool)
+        self.page4 = Page4(self, self.buttons, self.vid_manager, 
+                           self.worker_pool)
         self.page5 = Page5(self, self.buttons, self.vid_manager)
         self.pages = [self.page1, self.page2, self.page3, 
                       self.page4, self.page5]
@@ -38,6 +45,8 @@ class MainApplication(tk.Frame):
     #This method is required due to the matplotlib embedded in Page 5. Need to close it manually.
     def on_closing(self):
         plt.close('all')  # Close all Matplotlib plots
+        self.worker_pool.shutdown()
+        self.vid_manager.close()
         self.quit()
         
     def move(self, direction):
@@ -2,6 +2,11 @@ import tkinter as tk
 from ttkbootstrap.constants import *
 import ttkbootstrap as tb
 
+# Thumbnails in the filmstrip under the preview
+FILMSTRIP_LENGTH = 10
+# Milliseconds between checks for thumbnails the proxy stream has reached
+FILMSTRIP_INTERVAL = 100
+
 class Page1(tk.Frame):
     def __init__(self, parent, control_btns, vid_manager, **kwargs):
         super().__init__(parent, **kwargs)
@@ -30,6 +35,7 @@ class Page1(tk.Frame):
         self.setup_video_preview()
         self.setup_spinbox()
         self.setup_skip_buttons()
+        self.setup_filmstrip()
         self.intro_frame.pack_forget()
         tk.Label(self, text="Stage 1: Setup", 
                  font='TkDefaultFont 16 bold').pack()
@@ -106,6 +112,44 @@ class Page1(tk.Frame):
         # Configure the grid to make the label expand
         skip_frames_frame.grid_columnconfigure(3, weight=1)
 
+    def setup_filmstrip(self):
+        self.filmstrip_frame = tb.Frame(self.image_container)
+        self.filmstrip_frame.pack(fill=tk.X, pady=(0,10))
+        self.thumbnail_indices = self.vid_manager.thumbnail_indices(FILMSTRIP_LENGTH)
+        self.thumbnail_labels = []
+        # Keep references to avoid garbage collection
+        self.thumbnail_images = {}
+        for column, index in enumerate(self.thumbnail_indices):
+            label = tk.Label(self.filmstrip_frame, cursor="hand2", 
+                             highlightthickness=2)
+            label.bind("<Button-1>", lambda event, index=index: 
+                       self.skip_frame(index - self.vid_manager.get_current_frame_count()))
+            label.grid(row=0, column=column, padx=1)
+            self.thumbnail_labels.append(label)
+        self.mark_filmstrip()
+        self.update_filmstrip()
+
+    def update_filmstrip(self):
+        '''Shows the thumbnails the proxy stream has decoded so far, checking
+        again later until every thumbnail is shown.'''
+        for label, index in zip(self.thumbnail_labels, self.thumbnail_indices):
+            if index not in self.thumbnail_images:
+                thumbnail = self.vid_manager.get_thumbnail(index)
+                if thumbnail is not None:
+                    self.thumbnail_images[index] = thumbnail
+                    label.config(image=thumbnail)
+        if len(self.thumbnail_images) < len(self.thumbnail_indices):
+            self.after(FILMSTRIP_INTERVAL, self.update_filmstrip)
+
+    def mark_filmstrip(self):
+        # Highlight the last thumbnail at or before the selected frame
+        current = self.vid_manager.get_current_frame_count()
+        marked = max(i for i, index in enumerate(self.thumbnail_indices) 
+                     if index <= current)
+        for i, label in enumerate(self.thumbnail_labels):
+            label.config(highlightbackground="red" if i == marked else 
+                         label.cget("background"))
+
     def setup_scale(self):
         self.scale_frame = tk.Frame(self.content_container, 
                                   highlightbackground="black", 
@@ -143,6 +187,7 @@ class Page1(tk.Frame):
     def skip_frame(self, num):
         self.image_label.config(image=self.vid_manager.get_next_frame(num))
         self.frame_count_label.config(text=f"Selected frame: {self.vid_manager.get_current_frame_count()} / {self.vid_manager.get_total_frame_count()}")
+        self.mark_filmstrip()
 
     def get_roi(self, roi_num):
         rect = self.vid_manager.select_roi(roi_num)
@@ -1,10 +1,7 @@
 import os
 import sys
-from multiprocessing import Process, Queue
-from queue import Empty
 import tkinter as tk
 from tkinter import filedialog
-import cv2
 import ttkbootstrap as tb
 from ttkbootstrap.constants import *
 from pathlib import Path
@@ -13,19 +10,24 @@ current_directory = os.path.dirname(sys.path[0])
 if current_directory not in sys.path:
     sys.path.append(current_directory)
 from extract_frame_cli.extract_frame import extract_frame
-from thresholding_cli.thresholding import calculate_threshold
+from thresholding_cli.thresholding import threshold_from_images
+from combine_images_cli.combine_images import to_gray
+from phystracker_cli.events import (Progress, StageCancelled, StageFailed, 
+                                    StageFinished)
 
 class Page2(tk.Frame):
-    def __init__(self, parent, control_btns, vid_manager, **kwargs):
+    def __init__(self, parent, control_btns, vid_manager, worker_pool, 
+                 **kwargs):
         super().__init__(parent, **kwargs)
         self.control_btns = control_btns
         self.vid_manager = vid_manager
+        self.worker_pool = worker_pool
+        self.job = None
 
         self.extraction_process_flag = False
         self.extraction_error_flag = False
         self.threshold_process_flag = False
         self.threshold_error_flag = False
-        self.queue = Queue()
 
         tk.Label(self, text="Stage 2: Video Processing", 
                  font='TkDefaultFont 14 bold').pack()
@@ -107,89 +109,64 @@ class Page2(tk.Frame):
         skip_num = self.vid_manager.get_skip()
         
         if input_path and output_path:
-            args = [Path(input_path), Path(output_path), skip_num]
-            if force:
-                args.append(True)
-            args.append(self.queue)
-            p1 = Process(target=extract_frame, args=tuple(args)) #multiprocessing
-            p1.start()
-            self.process_button['state'] = 'disabled'
-            self.process_button.config(text='Processing')
-            self.check_extraction_status()
+            args = (Path(input_path), Path(output_path), skip_num, force)
+            self.extraction_process_flag = False
+            self.extraction_error_flag = False
+            self.output_msg.config(text="")
+            self.job = self.worker_pool.submit("extract_frame", extract_frame, 
+                                               args, 
+                                               on_event=self.on_extraction_event)
+            self.process_button.config(text='Cancel', 
+                                       command=self.cancel_extraction)
+
+    def cancel_extraction(self):
+        self.worker_pool.cancel(self.job)
 
-            roi1 = self.vid_manager.get_roi(1)[0]
-            cv2.imwrite(f"{self.output_path}{os.sep}roi1.png", roi1)
-            roi2 = self.vid_manager.get_roi(2)[0]
-            cv2.imwrite(f"{self.output_path}{os.sep}roi2.png", roi2)
+    def reset_process_button(self):
+        self.process_button['state'] = 'active'
+        self.process_button.config(text='Process', command=self.extract_frames)
 
-    def check_extraction_status(self):
-        if self.extraction_process_flag:
+    def on_extraction_event(self, event):
+        if isinstance(event, Progress) and event.total:
+            progress_percent = event.count/event.total * 100
+            if progress_percent > 95: #Need to wait until thresholding also finishes. Simulate measuring both processes
+                progress_percent = 95
+            self.progress_bar['value'] = progress_percent
+        elif isinstance(event, StageFinished):
+            self.vid_manager.set_frame_duration(event.result["frame_delta_t"])
+            self.extraction_process_flag = True
+            self.extraction_error_flag = False
             self.calculate_threshold()
-            return
-        elif self.extraction_error_flag:
-            return
-        try:
-            message = self.queue.get(block=False)
-        except Empty:
-            pass
-        else:
-            if message.startswith("Progress"):
-                progress = message.split(" ")[1].split("/")
-                progress_percent = int(progress[0])/int(progress[1]) * 100
-                if progress_percent > 95: #Need to wait until thresholding also finishes. Simulate measuring both processes
-                    progress_percent = 95
-                self.progress_bar['value'] = progress_percent
-            elif message.startswith("frame_delta_t"):
-                f_delta_t = float(message.split("=")[1].strip())
-                self.vid_manager.set_frame_duration(f_delta_t)
-            elif message == "Process successful":
-                self.extraction_process_flag = True
-                self.extraction_error_flag = False
-            else:
-                self.output_msg.config(text="Process unsuccessful", fg="red")
-                self.extraction_error_flag = True
-                self.extraction_process_flag = False
-        finally:
-            self.after(20, self.check_extraction_status)
+        elif isinstance(event, StageFailed):
+            self.output_msg.config(text="Process unsuccessful", fg="red")
+            self.extraction_error_flag = True
+            self.extraction_process_flag = False
+            self.reset_process_button()
+        elif isinstance(event, StageCancelled):
+            self.output_msg.config(text="Process cancelled", fg="red")
+            self.progress_bar['value'] = 0
+            self.reset_process_button()
 
     def calculate_threshold(self):
-        self.roi1_path = Path(f"{self.output_path}{os.sep}roi1.png")
-        self.roi2_path= Path(f"{self.output_path}{os.sep}roi2.png")
-        x = self.vid_manager.get_roi(1)[1][0]
-        y = self.vid_manager.get_roi(1)[1][1]
-        threshold_process = Process(target=calculate_threshold, 
-                                    args=(self.roi1_path, self.roi2_path, x, y, self.queue))
-        threshold_process.start()
-        self.check_threshold_status()
-    
-    def check_threshold_status(self):
-        if self.threshold_process_flag:
-            os.remove(self.roi1_path)
-            os.remove(self.roi2_path)
-            return
-        elif self.threshold_error_flag:
-            return
+        # Fast enough to run in-process, only regions of two frames are read
+        roi1, region = self.vid_manager.get_roi(1)
+        roi2 = self.vid_manager.get_roi(2)[0]
         try:
-            message = self.queue.get(block=False)
-        except Empty:
-            pass
-        else:
-            if message.startswith("Threshold Amount"):
-                threshold = message.split(": ")[1]
-                self.vid_manager.set_threshold(int(threshold))
-                self.progress_bar['value'] = 100
-                self.output_msg.config(text="Process successful", fg="green")
-                self.process_button['state'] = 'active'
-                self.process_button.config(text='Process')
-                self.threshold_process_flag = True
-                self.threshold_error_flag = False
-                self.control_btns.on_next()
-            else:
-                self.output_msg.config(text="Process unsuccessful", fg="red")
-                self.error_flag = True
-                self.threshold_process_flag = False
-        finally:
-            self.after(100, self.check_threshold_status)
+            threshold, stats = threshold_from_images(to_gray(roi1), 
+                                                     to_gray(roi2), [region])
+        except Exception:
+            self.output_msg.config(text="Process unsuccessful", fg="red")
+            self.threshold_error_flag = True
+            self.threshold_process_flag = False
+            self.reset_process_button()
+            return
+        self.vid_manager.set_threshold(threshold)
+        self.progress_bar['value'] = 100
+        self.output_msg.config(text="Process successful", fg="green")
+        self.reset_process_button()
+        self.threshold_process_flag = True
+        self.threshold_error_flag = False
+        self.control_btns.on_next()
 
     def can_next(self):
         if self.vid_manager.get_output_path() and self.extraction_process_flag \
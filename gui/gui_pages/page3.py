@@ -1,7 +1,5 @@
 import os
 import sys
-from multiprocessing import Process, Queue
-from queue import Empty
 import tkinter as tk
 import cv2
 import ttkbootstrap as tb
@@ -13,15 +11,19 @@ if current_directory not in sys.path:
     sys.path.append(current_directory)
 
 from combine_images_cli.combine_images import combine_images
+from phystracker_cli.events import (Progress, StageCancelled, StageFailed, 
+                                    StageFinished)
 
 class Page3(tk.Frame):
-    def __init__(self, parent, control_btns, vid_manager, **kwargs):
+    def __init__(self, parent, control_btns, vid_manager, worker_pool, 
+                 **kwargs):
         super().__init__(parent, **kwargs)
         self.control_btns = control_btns
         self.vid_manager = vid_manager
+        self.worker_pool = worker_pool
+        self.job = None
         self.combine_process_flag = False
         self.combine_error_flag = False
-        self.queue = Queue()
         
         tk.Label(self, text="Stage 2: Video Processing", 
                  font='TkDefaultFont 14 bold').pack()
@@ -72,41 +74,44 @@ class Page3(tk.Frame):
 
         threshold = self.vid_manager.get_threshold()
         if input_path and self.output_path:
-            p1 = Process(target=combine_images, 
-                         args=(Path(input_path), Path(self.output_path), 
-                               threshold, False, self.queue)
-                        )
-            p1.start()
-            self.process_button['state'] = 'disabled'
-            self.process_button.config(text='Processing')
-            self.check_combine_status()
+            args = (Path(input_path), Path(self.output_path), threshold, 
+                    False)
+            self.combine_process_flag = False
+            self.combine_error_flag = False
+            self.output_msg.config(text="")
+            self.job = self.worker_pool.submit("combine_images", combine_images, 
+                                               args, 
+                                               on_event=self.on_combine_event)
+            self.process_button.config(text='Cancel', 
+                                       command=self.cancel_combine)
 
-    def check_combine_status(self):
-        if self.combine_process_flag or self.combine_error_flag:
-            return
-        try:
-            message = self.queue.get(block=False)
-        except Empty:
-            pass
-        else:
-            if message.startswith("Progress"):
-                progress = message.split(" ")[1].split("/")
-                self.progress_bar['value'] = int(progress[0])/int(progress[1]) * 100
-            elif message == "Process successful":
-                self.output_msg.config(text="Process successful", fg="green")
-                self.progress_bar['value'] = 100
-                self.control_btns.on_next()
-                self.setup_image()
-                self.process_button['state'] = 'active'
-                self.process_button.config(text='Process')
-                self.combine_process_flag = True
-                self.combine_error_flag = False
-            else:
-                self.output_msg.config(text="Process unsuccessful", fg="red")
-                self.combine_error_flag = True
-                self.combine_process_flag = False
-        finally:
-            self.after(100, self.check_combine_status)
+    def cancel_combine(self):
+        self.worker_pool.cancel(self.job)
+
+    def reset_process_button(self):
+        self.process_button['state'] = 'active'
+        self.process_button.config(text='Process', command=self.combine_frames)
+
+    def on_combine_event(self, event):
+        if isinstance(event, Progress) and event.total:
+            self.progress_bar['value'] = event.count/event.total * 100
+        elif isinstance(event, StageFinished):
+            self.output_msg.config(text="Process successful", fg="green")
+            self.progress_bar['value'] = 100
+            self.control_btns.on_next()
+            self.setup_image()
+            self.reset_process_button()
+            self.combine_process_flag = True
+            self.combine_error_flag = False
+        elif isinstance(event, StageFailed):
+            self.output_msg.config(text="Process unsuccessful", fg="red")
+            self.combine_error_flag = True
+            self.combine_process_flag = False
+            self.reset_process_button()
+        elif isinstance(event, StageCancelled):
+            self.output_msg.config(text="Process cancelled", fg="red")
+            self.progress_bar['value'] = 0
+            self.reset_process_button()
 
     def setup_image(self):
         self.img_container = tk.Frame(self, highlightthickness=1, 
@@ -4,8 +4,6 @@ import tkinter as tk
 import cv2
 import ttkbootstrap as tb
 from ttkbootstrap.constants import *
-from multiprocessing import Process, Queue
-from queue import Empty
 from pathlib import Path
 
 current_directory = os.path.dirname(sys.path[0])
@@ -13,18 +11,22 @@ if current_directory not in sys.path:
     sys.path.append(current_directory)
 from blob_detection_cli.blob_detection import detect_blobs
 from get_positions_cli.get_positions import get_positions
+from phystracker_cli.events import (Progress, StageCancelled, StageFailed, 
+                                    StageFinished)
 
 #blob detection and getting path positions
 class Page4(tk.Frame):
-    def __init__(self, parent, control_btns, vid_manager, **kwargs):
+    def __init__(self, parent, control_btns, vid_manager, worker_pool, 
+                 **kwargs):
         super().__init__(parent, **kwargs)
         self.control_btns = control_btns
         self.vid_manager = vid_manager
+        self.worker_pool = worker_pool
+        self.job = None
         self.blob_process_flag = False
         self.blob_error_flag = False
         self.position_process_flag = False
         self.position_error_flag = False
-        self.queue = Queue()
 
         tk.Label(self, text="Stage 2: Video Processing", 
                  font='TkDefaultFont 14 bold').pack()
@@ -63,42 +65,48 @@ class Page4(tk.Frame):
         scale = self.vid_manager.get_scale()
 
         if input_path and frame_duration and roi and scale:
-            p1 = Process(target=get_positions, 
-                         args=(Path(input_path), frame_duration, roi, scale, 
-                               "average.jpg", self.queue)
-                        )
-            p1.start()
-            self.check_position_status()
-            self.process_button['state'] = 'disabled'
-            self.process_button.config(text='Processing')
-            self.vid_manager.set_csv_path(f"{input_path}{os.sep}data{os.sep}position_data.csv")
+            args = (Path(input_path), frame_duration, roi, scale, 
+                    "average.jpg")
+            self.position_process_flag = False
+            self.position_error_flag = False
+            self.blob_process_flag = False
+            self.blob_error_flag = False
+            self.output_msg.config(text="")
+            self.job = self.worker_pool.submit("get_positions", get_positions, 
+                                               args, 
+                                               on_event=self.on_position_event)
+            self.process_button.config(text='Cancel', command=self.cancel_job)
+            self.vid_manager.set_csv_path(f"{input_path}{os.sep}data{os.sep}position_data.npy")
     
-    def check_position_status(self):
-        if self.position_process_flag:
+    def cancel_job(self):
+        self.worker_pool.cancel(self.job)
+
+    def reset_process_button(self):
+        self.process_button['state'] = 'active'
+        self.process_button.config(text='Process', command=self.get_positions)
+
+    def on_cancelled(self):
+        self.output_msg.config(text="Process cancelled", fg="red")
+        self.progress_bar['value'] = 0
+        self.reset_process_button()
+
+    def on_position_event(self, event):
+        if isinstance(event, Progress) and event.total:
+            progress_percent = event.count/event.total * 100
+            if progress_percent > 95: #Need to wait until blob detection also finishes. Simulate measuring both processes
+                progress_percent = 95
+            self.progress_bar['value'] = progress_percent
+        elif isinstance(event, StageFinished):
+            self.position_process_flag = True
+            self.position_error_flag = False
             self.blob_detection()
-            return
-        elif self.position_error_flag:
-            return
-        try:
-            message = self.queue.get(block=False)
-        except Empty:
-            pass
-        else:
-            if message.startswith("Progress"):
-                progress = message.split(" ")[1].split("/")
-                progress_percent = int(progress[0])/int(progress[1]) * 100
-                if progress_percent > 95: #Need to wait until thresholding also finishes. Simulate measuring both processes
-                    progress_percent = 95
-                self.progress_bar['value'] = progress_percent
-            elif message == "Process successful":
-                self.position_process_flag = True
-                self.position_error_flag = False
-            else:
-                self.output_msg.config(text="Process unsuccessful", fg="red")
-                self.position_error_flag = True
-                self.position_process_flag = False
-        finally:
-            self.after(20, self.check_position_status)
+        elif isinstance(event, StageFailed):
+            self.output_msg.config(text="Process unsuccessful", fg="red")
+            self.position_error_flag = True
+            self.position_process_flag = False
+            self.reset_process_button()
+        elif isinstance(event, StageCancelled):
+            self.on_cancelled()
 
     def blob_detection(self):
         input_path = self.vid_manager.get_output_path()
@@ -106,37 +114,27 @@ class Page4(tk.Frame):
         input_image = f"{input_path}{os.sep}mask{os.sep}mask.png"
         output_path = f"{input_path}{os.sep}mask"
         if input_image:
-            p2 = Process(target=detect_blobs, 
-                         args=(Path(input_image), Path(output_path), 
-                               roi, self.queue)
-                        )
-            p2.start()
-            #TODO: ALso handle the errors even tho user cant see
-            self.check_blob_status()
+            args = (Path(input_image), Path(output_path), roi)
+            self.job = self.worker_pool.submit("detect_blobs", detect_blobs, 
+                                               args, 
+                                               on_event=self.on_blob_event)
 
-    def check_blob_status(self):
-        if self.blob_process_flag or self.blob_error_flag:
-            return
-        try:
-            message = self.queue.get(block=False)
-        except Empty:
-            pass
-        else:
-            if message == "Process successful":
-                self.output_msg.config(text="Process successful", fg="green")
-                self.progress_bar['value'] = 100
-                self.control_btns.on_next()
-                self.process_button['state'] = 'active'
-                self.process_button.config(text='Process')
-                self.setup_path_img()
-                self.blob_process_flag = True
-                self.blob_error_flag = False
-            else:
-                self.output_msg.config(text="Process unsuccessful", fg="red")
-                self.blob_error_flag = True
-                self.blob_process_flag = False
-        finally:
-            self.after(100, self.check_blob_status)
+    def on_blob_event(self, event):
+        if isinstance(event, StageFinished):
+            self.output_msg.config(text="Process successful", fg="green")
+            self.progress_bar['value'] = 100
+            self.control_btns.on_next()
+            self.reset_process_button()
+            self.setup_path_img()
+            self.blob_process_flag = True
+            self.blob_error_flag = False
+        elif isinstance(event, StageFailed):
+            self.output_msg.config(text="Process unsuccessful", fg="red")
+            self.blob_error_flag = True
+            self.blob_process_flag = False
+            self.reset_process_button()
+        elif isinstance(event, StageCancelled):
+            self.on_cancelled()
 
     def setup_path_img(self):
         path_container = tk.Frame(self)
@@ -4,14 +4,90 @@ import tkinter as tk
 import matplotlib.pyplot as plt
 import numpy as np
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
-from ttkbootstrap.tableview import Tableview
 import ttkbootstrap as tb
 
 current_directory = os.path.dirname(sys.path[0])
 if current_directory not in sys.path:
     sys.path.append(current_directory)
 
-from generate_graph_cli.generate_graph import read_csv, calculate_acceleration, calculate_velocity
+from generate_graph_cli.downsample import MAX_POINTS, downsample
+from generate_graph_cli.generate_graph import read_csv
+from generate_graph_cli.kinematics import DEFAULT_METHOD, DERIVATIVE_METHODS, derivatives
+
+class VirtualTable(tk.Frame):
+    '''Read-only table over NumPy columns. Only the visible rows exist as
+    Treeview items, and scrolling rewrites their values from the arrays,
+    so the cost of showing the table doesn't grow with the number of
+    rows.
+
+    Parameters:
+        parent: Parent widget.
+        headings(list): Column headings.
+        height(int): Number of visible rows.
+        decimals(int): Decimal places shown.
+    '''
+    def __init__(self, parent, headings, height=10, decimals=4, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.height = height
+        self.decimals = decimals
+        self.columns = [np.empty(0) for _ in headings]
+        self.first = 0
+        self.tree = tb.Treeview(self, columns=headings, show="headings", 
+                                height=height, bootstyle="primary")
+        for heading in headings:
+            self.tree.heading(heading, text=heading)
+            self.tree.column(heading, width=110, anchor=tk.E)
+        self.scrollbar = tb.Scrollbar(self, orient=tk.VERTICAL, 
+                                      command=self.scroll)
+        self.tree.pack(side=tk.LEFT, fill=tk.Y)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.bind("<MouseWheel>", self.on_wheel)
+        self.tree.bind("<Button-4>", self.on_wheel)
+        self.tree.bind("<Button-5>", self.on_wheel)
+
+    def row_count(self):
+        return len(self.columns[0])
+
+    def set_columns(self, *columns):
+        self.columns = columns
+        self.first = 0
+        self.refresh()
+
+    def refresh(self):
+        visible = min(self.height, self.row_count())
+        items = list(self.tree.get_children())
+        if len(items) > visible:
+            self.tree.delete(*items[visible:])
+            items = items[:visible]
+        while len(items) < visible:
+            items.append(self.tree.insert("", tk.END))
+        for offset, item in enumerate(items):
+            row = self.first + offset
+            self.tree.item(item, values=[f"{column[row]:.{self.decimals}f}" 
+                                         for column in self.columns])
+        if self.row_count():
+            self.scrollbar.set(self.first / self.row_count(), 
+                               (self.first + visible) / self.row_count())
+        else:
+            self.scrollbar.set(0, 1)
+
+    def scroll(self, action, value, unit=None):
+        '''Scrollbar command, value is a fraction for moveto and a number
+        of units or pages for scroll.'''
+        if action == "moveto":
+            first = int(float(value) * self.row_count())
+        else:
+            step = self.height if unit == "pages" else 1
+            first = self.first + int(value) * step
+        self.first = min(max(first, 0), max(self.row_count() - self.height, 0))
+        self.refresh()
+
+    def on_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.scroll("scroll", -3, "units")
+        else:
+            self.scroll("scroll", 3, "units")
+        return "break"
 
 #graph display
 class Page5(tk.Frame):
@@ -32,6 +108,11 @@ class Page5(tk.Frame):
         graph_button = tk.OptionMenu(self.table_container, self.item_var, *plot_types, 
                                      command=self.plot_graph)
         graph_button.pack(pady=10)
+        self.method_var = tk.StringVar(value=DEFAULT_METHOD)
+        method_button = tk.OptionMenu(self.table_container, self.method_var, 
+                                      *DERIVATIVE_METHODS, 
+                                      command=self.change_method)
+        method_button.pack(pady=(0,10))
 
     def setup_graph(self):
         graph_frame = tk.Frame(self)
@@ -49,40 +130,32 @@ class Page5(tk.Frame):
     def setup_table(self):
         self.table_container = tk.Frame(self)
         self.table_container.pack(side=tk.RIGHT, fill=tk.Y)
-        coldata = [
-            {"text": "Time (sec)"},
-            {"text": "X Position (m)"},
-            {"text": "Y Position (m)"},
-        ]
-        self.table = Tableview(master=self.table_container, coldata=coldata, 
-                       paginated=False, searchable=False, bootstyle="primary")
-        self.table.config(height=10)
+        headings = ["Time (sec)", "X Position (m)", "Y Position (m)"]
+        self.table = VirtualTable(self.table_container, headings, height=10)
         self.table.pack(side=tk.TOP, padx=(0,10), pady=(50,0))
         
     def add_table_values(self, path):
-        self.times = []
-        self.x = []
-        self.y = []
-        self.times, self.x, self.y = read_csv(path)
-        rows_to_insert = []
-        for i in range(len(self.times)):
-            round_time = round(self.times[i], 4)
-            round_x = round(self.x[i], 4)
-            round_y = round(self.y[i], 4)
-            rows_to_insert.append([round_time, round_x, round_y])
-
-        self.table.insert_rows('end', rows_to_insert)
-        self.table.unload_table_data()
-        self.table.load_table_data()
-        self.table.autoalign_columns()
-        self.table.autofit_columns()
-        self.table.sort_column_data(cid=0, sort=0)
-        
-        self.np_x_coords = np.array(self.x)
-        self.np_y_coords = np.array(self.y)
-        self.np_times = np.array(self.times)
+        # Copied so no memory map of the file stays open, position_data.npy
+        # can then be overwritten by the next run (Windows refuses while it
+        # is mapped)
+        self.np_times, self.np_x_coords, self.np_y_coords = [
+            np.array(column) for column in read_csv(path)]
+        self.table.set_columns(self.np_times, self.np_x_coords, 
+                               self.np_y_coords)
+        self.calculate_kinematics()
 
         self.plot_graph("x Position")
+
+    def calculate_kinematics(self):
+        # x and y are differentiated together, once per method change
+        (self.velocity_times, self.velocities, self.acceleration_times, 
+         self.accelerations) = derivatives(
+            self.np_times, np.stack([self.np_x_coords, self.np_y_coords]), 
+            self.method_var.get())
+
+    def change_method(self, method):
+        self.calculate_kinematics()
+        self.plot_graph(self.item_var.get())
         
     def plot_graph(self, plot_type):
         if plot_type == "x Position":
@@ -98,35 +171,37 @@ class Page5(tk.Frame):
             title = 'Y Coordinate vs Time'
 
         elif plot_type == "x Velocity":
-            x_velocity, times = calculate_velocity(self.x, self.times)
-            x, y = times, x_velocity
+            x, y = self.velocity_times, self.velocities[0]
             x_label = 'Time (seconds)'
             y_label = 'X Velocity (m/s)'
             title = 'X Velocity vs Time'
 
         elif plot_type == "y Velocity":
-            y_velocity, times = calculate_velocity(self.y, self.times)
-            x, y = times, y_velocity
+            x, y = self.velocity_times, self.velocities[1]
             x_label = 'Time (seconds)'
             y_label = 'Y Velocity (m/s)'
             title = 'Y Velocity vs Time'
 
         elif plot_type == "x Acceleration":
-            x_acceleration, times = calculate_acceleration(self.x, self.times)
-            x, y = times, x_acceleration
+            x, y = self.acceleration_times, self.accelerations[0]
             x_label = 'Time (seconds)'
             y_label = 'X Acceleration (m$^2$/s)'
             title = 'X Acceleration vs Time'
             
         elif plot_type == "y Acceleration":
-            y_acceleration, times = calculate_acceleration(self.y, self.times)
-            x, y = times, y_acceleration
+            x, y = self.acceleration_times, self.accelerations[1]
             x_label = 'Time (seconds)'
             y_label = 'Y Acceleration (m$^2$/s)'
             title = 'Y Acceleration vs Time'
 
         self.ax.clear()
-        self.plot = self.ax.scatter(x, y, color='blue', marker='+', label=title)
+        # Large series are drawn downsampled, on_xlim_changed picks the
+        # points again from the full series when the view is zoomed or panned
+        self.plot_x, self.plot_y = np.asarray(x), np.asarray(y)
+        shown = downsample(self.plot_x, self.plot_y, MAX_POINTS)
+        self.plot = self.ax.scatter(self.plot_x[shown], self.plot_y[shown], 
+                                    color='blue', marker='+', label=title)
+        self.ax.callbacks.connect('xlim_changed', self.on_xlim_changed)
         self.ax.set_xlabel(x_label)
         self.ax.set_ylabel(y_label)
         self.ax.grid(True, which='both', linestyle='--')
@@ -146,6 +221,12 @@ class Page5(tk.Frame):
 
         self.fig.canvas.mpl_connect('motion_notify_event', self.detect_point)
         
+    def on_xlim_changed(self, ax):
+        shown = downsample(self.plot_x, self.plot_y, MAX_POINTS, ax.get_xlim())
+        self.plot.set_offsets(np.column_stack([self.plot_x[shown], 
+                                               self.plot_y[shown]]))
+        self.canvas.draw_idle()
+
     def detect_point(self, event):
         annotation_visibility = self.annotation.get_visible()
         if event.inaxes == self.ax:
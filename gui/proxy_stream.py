@@ -0,0 +1,56 @@
+import cv2, tempfile, threading
+import numpy as np
+
+class ProxyStream:
+    '''Low resolution RGB copy of every frame of a video, decoded in one
+    sequential pass on a background thread. Frames are kept in a temporary
+    file mapped with np.memmap, so a long video doesn't have to fit in
+    memory. Frames are ready in order, get() returns None for frames that
+    haven't been decoded yet.
+
+    Parameters:
+        path(str): Video file.
+        size(tuple): (width, height) of the proxy frames.
+        frame_count(int): Number of frames to keep, extra frames are ignored.
+    '''
+    def __init__(self, path, size, frame_count):
+        self.size = size
+        self.file = tempfile.TemporaryFile()
+        self.frames = np.memmap(self.file, dtype=np.uint8, mode="w+",
+                                shape=(max(frame_count, 1), size[1],
+                                       size[0], 3))
+        self.count = 0
+        self.done = False
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.decode, args=(path,),
+                                       daemon=True)
+        self.thread.start()
+
+    def decode(self, path):
+        video = cv2.VideoCapture(path)
+        try:
+            while self.count < len(self.frames) and not self.stopped.is_set():
+                read_success, frame = video.read()
+                if not read_success:
+                    break
+                frame = cv2.resize(frame, self.size,
+                                   interpolation=cv2.INTER_AREA)
+                self.frames[self.count] = cv2.cvtColor(frame,
+                                                       cv2.COLOR_BGR2RGB)
+                # Only counted once written, the Tk thread reads up to count
+                self.count += 1
+        finally:
+            video.release()
+            self.done = True
+
+    def get(self, index):
+        if 0 <= index < self.count:
+            return self.frames[index]
+        return None
+
+    def close(self):
+        self.stopped.set()
+        self.thread.join()
+        self.count = 0
+        del self.frames
+        self.file.close()
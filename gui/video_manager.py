@@ -1,7 +1,24 @@
-import cv2, math
+import cv2, math, threading
+import numpy as np
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from PIL import ImageTk, Image
 from tkinter import simpledialog
 
+from proxy_stream import ProxyStream
+
+PREVIEW_RATIO = 1.5
+# Frames decoded around the selected frame in the background
+PREFETCH_RADIUS = 5
+# Memory budget for decoded frames, at least the prefetch window is kept
+FRAME_CACHE_BYTES = 256 * 1024 * 1024
+# Forward jumps up to this many frames decode through instead of seeking,
+# which would restart decoding from the previous keyframe
+MAX_GRAB_DISTANCE = 30
+# Disk budget for the proxy stream, long videos get smaller proxy frames
+PROXY_BYTES = 1024 * 1024 * 1024
+THUMBNAIL_HEIGHT = 54
+
 class VideoManager:
     def __init__(self, parent_size):
         self.parent_width = parent_size[0]
@@ -20,13 +37,60 @@ class VideoManager:
 
         self.csv_path = None
 
+        self.video = None
+        self.proxy = None
+        self.decoder_lock = threading.Lock()
+        self.cache_lock = threading.Lock()
+        self.frame_cache = OrderedDict()
+        self.rendered_cache = OrderedDict()
+        self.prefetcher = ThreadPoolExecutor(max_workers=1)
+
     def set_video(self, path):
-        self.vid_path = path
-        self.video = cv2.VideoCapture(path)
+        with self.decoder_lock:
+            if self.video is not None:
+                self.video.release()
+            self.vid_path = path
+            self.video = cv2.VideoCapture(path)
+            self.decoder_position = 0
         self.total_frame_count = int(self.video.get(cv2.CAP_PROP_FRAME_COUNT)) - 1
         self.current_frame_count = 0
         if not self.video.isOpened():
             raise ValueError("Error opening video file")
+        self.video_width = int(self.video.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.video_height = int(self.video.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.cache_size = max(2 * PREFETCH_RADIUS + 1, 
+                              FRAME_CACHE_BYTES // max(self.video_width 
+                                                       * self.video_height * 3, 1))
+        with self.cache_lock:
+            self.frame_cache.clear()
+        self.rendered_cache.clear()
+        self.start_proxy()
+
+    def start_proxy(self):
+        '''Starts decoding the proxy stream that drives the preview and the
+        thumbnails. Its frames are the preview size, or smaller when the
+        whole video wouldn't fit in PROXY_BYTES.'''
+        if self.proxy is not None:
+            self.proxy.close()
+        frame_count = self.total_frame_count + 1
+        proxy_width, proxy_height = self.preview_size(self.video_width, 
+                                                      self.video_height,
+                                                      PREVIEW_RATIO)
+        proxy_bytes = frame_count * proxy_width * proxy_height * 3
+        if proxy_bytes > PROXY_BYTES:
+            factor = math.sqrt(PROXY_BYTES / proxy_bytes)
+            proxy_width = max(int(proxy_width * factor), 1)
+            proxy_height = max(int(proxy_height * factor), 1)
+        self.proxy = ProxyStream(self.vid_path, (proxy_width, proxy_height),
+                                 frame_count)
+
+    def close(self):
+        self.prefetcher.shutdown(wait=False, cancel_futures=True)
+        if self.proxy is not None:
+            self.proxy.close()
+        with self.decoder_lock:
+            if self.video is not None:
+                self.video.release()
 
     def get_vid_path(self):
         return self.vid_path
@@ -62,7 +126,11 @@ class VideoManager:
         return self.total_frame_count
     
     def get_current_image(self):
-        return self.current_image
+        '''Full resolution frame currently selected. Navigation only uses
+        the proxy, so the frame is decoded here when it is needed.'''
+        cached = self.read_frame(self.current_frame_count)
+        if cached is not None:
+            return cached[0]
     
     def set_region(self, region):
         self.region = region
@@ -95,51 +163,159 @@ class VideoManager:
         elif new_frame > self.total_frame_count:
             new_frame = self.total_frame_count
 
-        cap = cv2.VideoCapture(self.vid_path)
-        cap.set(cv2.CAP_PROP_POS_FRAMES, new_frame)
-        res, frame = cap.read()
-        if res:
-            self.current_image = frame
+        proxy_frame = self.proxy.get(new_frame)
+        if proxy_frame is not None:
+            self.frame_image = self.get_rendered_frame(
+                new_frame, lambda: self.prepare_proxy_image(proxy_frame))
+            self.current_frame_count = new_frame
+            return self.frame_image
+
+        # The proxy hasn't reached this frame yet
+        cached = self.read_frame(new_frame)
+        if cached is not None:
+            frame, preview = cached
             #keep reference to avoid garbage collection
-            self.frame_image = self.render_image(frame, 1.5)
+            self.frame_image = self.get_rendered_frame(new_frame, 
+                                                       lambda: preview)
             self.current_frame_count = new_frame
+            self.prefetcher.submit(self.prefetch, new_frame)
             return self.frame_image
 
+    def read_frame(self, index):
+        '''Returns the decoded frame at index and its preview image, using
+        the cache when possible.
+
+        Return:
+            tuple: (frame, preview) or None if the frame can't be read.
+        '''
+        with self.cache_lock:
+            if index in self.frame_cache:
+                self.frame_cache.move_to_end(index)
+                return self.frame_cache[index]
+        with self.decoder_lock:
+            return self.decode_frame(index)
+
+    def decode_frame(self, index):
+        # Caller must hold decoder_lock
+        distance = index - self.decoder_position
+        if distance < 0 or distance > MAX_GRAB_DISTANCE:
+            self.video.set(cv2.CAP_PROP_POS_FRAMES, index)
+        else:
+            for _ in range(distance):
+                self.video.grab()
+        res, frame = self.video.read()
+        if not res:
+            # Position is unknown after a failed read, seek next time
+            self.decoder_position = -MAX_GRAB_DISTANCE - 1
+            return None
+        self.decoder_position = index + 1
+        entry = (frame, self.prepare_image(frame, PREVIEW_RATIO))
+        with self.cache_lock:
+            self.frame_cache[index] = entry
+            self.frame_cache.move_to_end(index)
+            while len(self.frame_cache) > self.cache_size:
+                self.frame_cache.popitem(last=False)
+        return entry
+
+    def prefetch(self, index):
+        '''Decodes the frames around index in one sequential pass. Stops
+        early if another frame is selected in the meantime.'''
+        start = max(index - PREFETCH_RADIUS, 0)
+        end = min(index + PREFETCH_RADIUS, self.total_frame_count)
+        for i in range(start, end + 1):
+            if self.current_frame_count != index:
+                return
+            with self.cache_lock:
+                cached = i in self.frame_cache
+            if not cached:
+                with self.decoder_lock:
+                    if self.decode_frame(i) is None:
+                        return
+
+    def get_rendered_frame(self, index, make_preview):
+        # PhotoImage must be created on the Tk thread, so this cache is
+        # only used from there.
+        if index in self.rendered_cache:
+            self.rendered_cache.move_to_end(index)
+            return self.rendered_cache[index]
+        rendered = ImageTk.PhotoImage(image=make_preview())
+        self.rendered_cache[index] = rendered
+        while len(self.rendered_cache) > 2 * PREFETCH_RADIUS + 1:
+            self.rendered_cache.popitem(last=False)
+        return rendered
+
+    def get_thumbnail(self, index):
+        '''Thumbnail of frame index made from the proxy stream.
+
+        Return:
+            PhotoImage: The thumbnail, None until the proxy reaches index.
+        '''
+        proxy_frame = self.proxy.get(index)
+        if proxy_frame is None:
+            return None
+        height, width = proxy_frame.shape[:2]
+        size = (max(int(width * THUMBNAIL_HEIGHT / height), 1), 
+                THUMBNAIL_HEIGHT)
+        thumbnail = cv2.resize(proxy_frame, size, interpolation=cv2.INTER_AREA)
+        return ImageTk.PhotoImage(image=Image.fromarray(thumbnail))
+
+    def thumbnail_indices(self, count):
+        '''Indices of count frames spread evenly over the video.'''
+        if count < 2 or self.total_frame_count <= 0:
+            return [0]
+        return sorted({round(i * self.total_frame_count / (count - 1)) 
+                       for i in range(count)})
+
     def render_image(self, image, ratio):
-        height, width, channels = image.shape
+        return ImageTk.PhotoImage(image=self.prepare_image(image, ratio))
+
+    def preview_size(self, width, height, ratio):
         max_height = int(self.parent_height / ratio)
         max_width = int(self.parent_width / ratio)
         aspect_ratio = width / height
         if height > max_height or width > max_width:
             if max_width / aspect_ratio <= max_height:
-                render_size = (max_width, int(max_width / aspect_ratio))
+                return (max_width, int(max_width / aspect_ratio))
             else:
-                render_size = (int(max_height * aspect_ratio), max_height)
-        else:
-            render_size = (width, height)
+                return (int(max_height * aspect_ratio), max_height)
+        return (width, height)
 
+    def prepare_image(self, image, ratio):
+        height, width, channels = image.shape
+        render_size = self.preview_size(width, height, ratio)
         image = cv2.resize(image, render_size, interpolation = cv2.INTER_LINEAR)
         image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        image = Image.fromarray(image)
-        return ImageTk.PhotoImage(image=image) 
+        return Image.fromarray(image)
+
+    def prepare_proxy_image(self, proxy_frame):
+        # Proxy frames are already RGB and only smaller than the preview
+        # when the video is too long for PROXY_BYTES
+        height, width = proxy_frame.shape[:2]
+        render_size = self.preview_size(self.video_width, self.video_height,
+                                        PREVIEW_RATIO)
+        if render_size != (width, height):
+            proxy_frame = cv2.resize(proxy_frame, render_size, 
+                                     interpolation=cv2.INTER_LINEAR)
+        return Image.fromarray(np.asarray(proxy_frame))
     
     def select_roi(self, roi_num):
-        x, y, w, h = cv2.selectROI(self.current_image)
+        image = self.get_current_image()
+        x, y, w, h = cv2.selectROI(image)
         cv2.destroyAllWindows()
         rect = (x, y, w, h)
         top_left=(x, x + w)
         bottom_right = (y, y + h)
         if roi_num == 1:
-            self.roi_image1 = self.current_image
+            self.roi_image1 = image
             self.roi_1 = (top_left, bottom_right)
         elif roi_num == 2:
-            self.roi_image2 = self.current_image
+            self.roi_image2 = image
             self.roi_2 = (top_left, bottom_right)
         return rect
 
     def setup_draw(self):
         self.points = []
-        self.scale_img = self.current_image.copy()
+        self.scale_img = self.get_current_image().copy()
         cv2.namedWindow("scale_window")
         cv2.setMouseCallback("scale_window", self.draw_event)
         cv2.imshow("scale_window", self.scale_img)
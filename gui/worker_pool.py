@@ -0,0 +1,177 @@
+import os, sys, ctypes, importlib, itertools, multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from queue import Empty
+
+current_directory = os.path.dirname(sys.path[0])
+if current_directory not in sys.path:
+    sys.path.append(current_directory)
+from phystracker_cli.events import (Cancelled, StageCancelled, StageFailed,
+                                    StageFinished, report_failure)
+
+# Imported by every worker when it starts, so a job doesn't wait for them
+PRELOAD_MODULES = ("cv2", "numpy", "extract_frame_cli.extract_frame",
+                   "combine_images_cli.combine_images",
+                   "blob_detection_cli.blob_detection",
+                   "get_positions_cli.get_positions")
+# Milliseconds between checks of the event queue
+PUMP_INTERVAL = 20
+# Cancel flags are shared with the workers in a fixed array indexed by job
+# id modulo its length, far more than the jobs that are ever in flight
+CANCEL_SLOTS = 1024
+FINAL_EVENTS = (StageFinished, StageFailed, StageCancelled)
+
+# State each worker sets up once in _init_worker
+_worker = {}
+
+class Job:
+    def __init__(self, stage, future, on_event):
+        self.stage = stage
+        self.future = future
+        self.on_event = on_event
+
+class WorkerPool:
+    '''Long lived worker processes that run the GUI's processing jobs.
+    Workers start with the pool and import the stage modules once, instead
+    of every job paying for a new process. Every job reports its events on
+    one shared queue, tagged with its id, and a single event pump on the Tk
+    main loop hands them to the callback given when the job was submitted.
+
+    Parameters:
+        root: Tk widget the event pump is scheduled on.
+        workers(int): Number of worker processes.
+        preload(tuple): Modules the workers import when they start.
+    '''
+    def __init__(self, root, workers=1, preload=PRELOAD_MODULES):
+        self.root = root
+        self.workers = workers
+        self.preload = preload
+        self.queue = multiprocessing.Queue()
+        self.cancel_flags = multiprocessing.RawArray(ctypes.c_bool,
+                                                     CANCEL_SLOTS)
+        self.jobs = {}
+        self.job_ids = itertools.count()
+        self.executor = None
+        self.start_workers()
+        self.pump_id = self.root.after(PUMP_INTERVAL, self.pump)
+
+    def start_workers(self):
+        self.executor = ProcessPoolExecutor(
+            self.workers, initializer=_init_worker,
+            initargs=(self.queue, self.cancel_flags, self.preload))
+        # Workers are started on demand, an empty job per worker starts
+        # them (and their imports) now rather than on the first click
+        for _ in range(self.workers):
+            self.executor.submit(int)
+
+    def restart_workers(self):
+        self.executor.shutdown(wait=False)
+        self.start_workers()
+
+    def submit(self, stage, function, args=(), on_event=None, **kwargs):
+        '''Runs function(*args, queue=queue, **kwargs) in a worker, where
+        queue sends the stage's events back to on_event.
+
+        Parameters:
+            stage(str): Name the job's failure is reported under.
+            function: Stage function taking a queue keyword argument.
+            on_event: Called on the Tk main loop with each Event.
+
+        Return:
+            Future: The job's result, cancel it with cancel().
+        '''
+        job_id = next(self.job_ids)
+        self.cancel_flags[job_id % CANCEL_SLOTS] = False
+        try:
+            future = self.executor.submit(_run_job, job_id, stage, function,
+                                          args, kwargs)
+        except BrokenProcessPool:
+            # A worker died while the pool was idle
+            self.restart_workers()
+            future = self.executor.submit(_run_job, job_id, stage, function,
+                                          args, kwargs)
+        future.job_id = job_id
+        self.jobs[job_id] = Job(stage, future, on_event)
+        return future
+
+    def cancel(self, future):
+        '''Cancels a job. A job still waiting for a worker is dropped, a
+        running job stops at its next progress update. Either way its
+        callback gets StageCancelled.'''
+        job = self.jobs.get(future.job_id)
+        if job is None:
+            return
+        if future.cancel():
+            self.dispatch(future.job_id, [StageCancelled(job.stage)])
+        else:
+            self.cancel_flags[future.job_id % CANCEL_SLOTS] = True
+
+    def pump(self):
+        '''Hands waiting events to their jobs' callbacks, then schedules
+        itself again.'''
+        while True:
+            try:
+                job_id, events = self.queue.get(block=False)
+            except Empty:
+                break
+            self.dispatch(job_id, events)
+
+        broken = False
+        for job_id, job in list(self.jobs.items()):
+            if job.future.done() and not job.future.cancelled() \
+                and isinstance(job.future.exception(), BrokenProcessPool):
+                # The worker died (e.g. out of memory) before reporting
+                self.dispatch(job_id, [StageFailed(job.stage,
+                                                   "Worker process crashed.")])
+                broken = True
+        if broken:
+            self.restart_workers()
+        self.pump_id = self.root.after(PUMP_INTERVAL, self.pump)
+
+    def dispatch(self, job_id, events):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        for event in events:
+            if job.on_event is not None:
+                job.on_event(event)
+            if isinstance(event, FINAL_EVENTS):
+                del self.jobs[job_id]
+                return
+
+    def shutdown(self):
+        '''Stops the event pump, cancels every job and lets the workers
+        exit.'''
+        self.root.after_cancel(self.pump_id)
+        for job in list(self.jobs.values()):
+            self.cancel_flags[job.future.job_id % CANCEL_SLOTS] = True
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+class JobQueue:
+    '''Queue handed to a stage in a worker. Tags its events with the job id
+    and lets its ProgressReporter see when the job is cancelled.'''
+    def __init__(self, job_id):
+        self.job_id = job_id
+
+    def put(self, events):
+        _worker["queue"].put((self.job_id, events))
+
+    def cancelled(self):
+        return _worker["cancel_flags"][self.job_id % CANCEL_SLOTS]
+
+def _init_worker(queue, cancel_flags, preload):
+    _worker["queue"] = queue
+    _worker["cancel_flags"] = cancel_flags
+    for module in preload:
+        importlib.import_module(module)
+
+def _run_job(job_id, stage, function, args, kwargs):
+    queue = JobQueue(job_id)
+    try:
+        return function(*args, queue=queue, **kwargs)
+    except Cancelled:
+        queue.put([StageCancelled(stage)])
+        raise
+    except Exception as err:
+        report_failure(stage, err, queue)
+        raise
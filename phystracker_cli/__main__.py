@@ -0,0 +1,3 @@
+from .phystracker import main
+
+main()
\ No newline at end of file
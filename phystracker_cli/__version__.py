@@ -0,0 +1,3 @@
+VERSION = (1, 0, 0)
+
+__version__ = '.'.join(map(str, VERSION))
\ No newline at end of file
@@ -0,0 +1,274 @@
+import os, csv, json, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from .batch_options import init_argparse
+from .events import ProgressReporter, report_failure
+from .pipeline import run_pipeline
+from extract_frame_cli.extract_frame_options import BACKGROUND_MODELS
+
+# Written to each job's output directory, read back to resume a batch
+JOB_STATUS = "status.json"
+SUMMARY_FILES = ("summary.csv", "summary.json")
+SUMMARY_FIELDS = ["name", "video", "status", "positions", "seconds",
+                  "output", "error"]
+# Options a job's results depend on, a finished job is run again when any
+# of them changes
+JOB_PARAMETERS = ("video", "roi", "scale", "threshold", "skip", "background",
+                  "gray")
+
+class BatchException(Exception):
+    pass
+
+def read_manifest(manifest_path):
+    '''Reads the list of videos to process from a CSV or JSON manifest.
+
+    CSV manifests have a header row; JSON manifests hold a list of objects
+    with the same keys. Required keys are video, roi (x,y,w,h), scale and
+    threshold. skip, background and name (the output directory, defaults
+    to the video file name) are optional. Relative video paths are
+    relative to the manifest.
+
+    Return:
+        list: One dict per job, in manifest order.
+    '''
+    manifest_path = Path(manifest_path).resolve()
+    if manifest_path.suffix.lower() == ".json":
+        with open(manifest_path) as manifest_file:
+            entries = json.load(manifest_file)
+    elif manifest_path.suffix.lower() == ".csv":
+        with open(manifest_path, newline="") as manifest_file:
+            entries = list(csv.DictReader(manifest_file))
+    else:
+        raise ValueError("Manifest must be a .csv or .json file.")
+
+    jobs = []
+    names = set()
+    for line, entry in enumerate(entries, start=1):
+        try:
+            job = parse_job(entry, manifest_path.parent)
+        except (KeyError, TypeError, ValueError) as err:
+            raise BatchException(f"Invalid manifest entry {line}: {err}")
+        if job["name"] in names:
+            raise BatchException(f"Invalid manifest entry {line}: name "
+                                 f"{job['name']} is used twice, set a "
+                                 "unique name column.")
+        names.add(job["name"])
+        jobs.append(job)
+    return jobs
+
+def parse_job(entry, base_path):
+    for key in ("video", "roi", "scale", "threshold"):
+        if entry.get(key) in (None, ""):
+            raise KeyError(f"missing {key}")
+    video = Path(entry["video"])
+    if not video.is_absolute():
+        video = base_path / video
+    roi = entry["roi"]
+    if isinstance(roi, str):
+        roi = roi.replace("(", "").replace(")", "").split(",")
+    roi = tuple(int(value) for value in roi)
+    if len(roi) != 4:
+        raise ValueError("roi must be x,y,w,h")
+    background = entry.get("background") or "mean"
+    if background not in BACKGROUND_MODELS:
+        raise ValueError(f"unknown background {background}")
+    name = str(entry.get("name") or video.stem)
+    # The name is the job's directory in the output directory, so it can't
+    # lead out of it
+    if name in (".", "..") or "/" in name or "\\" in name \
+        or os.path.splitdrive(name)[0]:
+        raise ValueError(f"name {name} must be a directory name without a "
+                         "path")
+    return {
+        "name": name,
+        "video": str(video),
+        "roi": roi,
+        "scale": float(entry["scale"]),
+        "threshold": int(entry["threshold"]),
+        "skip": int(entry.get("skip") or 1),
+        "background": background,
+    }
+
+def run_batch(manifest_path, output_path, workers=1, rerun=False,
+              progress="text", gray=False):
+    '''Runs the streaming pipeline on every video in a manifest. Each video
+    gets its own directory in output_path holding mask.png,
+    position_data.csv and status.json. Jobs that already finished with the
+    same parameters are skipped, so an interrupted batch continues where
+    it stopped. A failed
+    job is recorded and the others carry on.
+
+    Parameters:
+        manifest_path(Path): CSV or JSON manifest, see read_manifest.
+        output_path(Path): Directory the job directories are created in.
+        workers(int): Number of videos processed at the same time.
+        rerun(bool): Process every job again, including finished ones.
+        progress(str): Progress printed to stdout, see ProgressReporter.
+        gray(bool): Process every video as single channel frames, see
+            run_pipeline.
+
+    Return:
+        list: Status of every job, as written to the summary.
+    '''
+    jobs = [dict(job, gray=gray) for job in read_manifest(manifest_path)]
+    output_abs_path = Path(output_path).resolve()
+    if not output_abs_path.is_dir():
+        raise FileNotFoundError(f"{output_abs_path} does not exist.")
+
+    statuses = {}
+    pending = []
+    for job in jobs:
+        job_path = output_abs_path / job["name"]
+        status = read_job_status(job_path)
+        if status is not None and status["status"] == "done" and not rerun \
+            and status.get("parameters") == job_parameters(job):
+            statuses[job["name"]] = status
+        else:
+            job_path.mkdir(exist_ok=True)
+            pending.append(job)
+
+    if progress == "text" and statuses:
+        print(f"Skipping {len(statuses)} finished jobs", flush=True)
+    reporter = ProgressReporter("batch", progress=progress)
+    reporter.start(len(pending))
+
+    skipped = len(statuses)
+    def finished(job, status):
+        statuses[job["name"]] = status
+        if progress == "text":
+            detail = (f"{status['positions']} positions"
+                      if status["status"] == "done" else status["error"])
+            print(f"{job['name']}: {status['status']} ({detail})", flush=True)
+        reporter.update(len(statuses) - skipped)
+
+    run_jobs(pending, output_abs_path, workers, finished, rerun)
+
+    summary = [statuses[job["name"]] for job in jobs]
+    write_summary(summary, output_abs_path)
+    failed = sum(status["status"] != "done" for status in summary)
+    if progress == "text":
+        print(f"{len(summary) - failed} of {len(summary)} jobs done, summary "
+              f"written to {output_abs_path / SUMMARY_FILES[0]}", flush=True)
+    reporter.finish(jobs=len(summary), failed=failed,
+                    summary=str(output_abs_path / SUMMARY_FILES[0]))
+    return summary
+
+def run_jobs(jobs, output_path, workers, finished, rerun=False):
+    '''Runs jobs on a process pool, calling finished(job, status) as each
+    one ends. A worker dying (e.g. out of memory) breaks the pool and
+    every unfinished job with it. Jobs that hadn't started are submitted
+    again on a new pool once, and jobs that were running, or that broke a
+    pool again, are run again one at a time, so only a job that crashes on
+    its own is marked failed.'''
+    queue = list(jobs)
+    suspects = []
+    retried = set()
+    while queue or suspects:
+        isolated = not queue
+        if isolated:
+            batch = [suspects.pop(0)]
+        else:
+            batch, queue = queue, []
+        with ProcessPoolExecutor(max(1, min(workers, len(batch)))) as pool:
+            futures = {pool.submit(run_job, job, str(output_path / job["name"]),
+                                   rerun): job for job in batch}
+            for future in as_completed(futures):
+                job = futures[future]
+                job_path = output_path / job["name"]
+                try:
+                    status = future.result()
+                except BrokenProcessPool as err:
+                    if not isolated:
+                        started = (read_job_status(job_path) or {}).get(
+                            "status") == "running"
+                        # A worker that dies before starting its job (e.g.
+                        # while importing) would break every new pool, so a
+                        # job is only retried with the others once
+                        if started or job["name"] in retried:
+                            suspects.append(job)
+                        else:
+                            retried.add(job["name"])
+                            queue.append(job)
+                        continue
+                    # The worker died running this job alone
+                    status = job_status(job, job_path, "failed", 
+                                        error=f"Worker crashed: {err}")
+                    write_job_status(job_path, status)
+                finished(job, status)
+
+def job_parameters(job):
+    # roi is compared as the list it is read back from JSON as
+    return {key: list(job[key]) if key == "roi" else job[key] 
+            for key in JOB_PARAMETERS}
+
+def run_job(job, job_path, rerun=False):
+    '''Process pool target. Exceptions are recorded in the job status
+    instead of being raised, so one bad video doesn't stop the batch. With
+    rerun the pipeline's stage cache is bypassed too.'''
+    job_path = Path(job_path)
+    write_job_status(job_path, job_status(job, job_path, "running"))
+    start = time.perf_counter()
+    try:
+        run_pipeline(Path(job["video"]), job_path, job["threshold"],
+                     job["roi"], job["scale"], job["skip"], force_flag=True,
+                     background=job["background"], progress=None, 
+                     cache=not rerun, gray=job["gray"])
+        positions = count_positions(job_path / "position_data.csv")
+        status = job_status(job, job_path, "done", positions=positions,
+                            seconds=time.perf_counter() - start)
+    except Exception as err:
+        status = job_status(job, job_path, "failed", error=str(err),
+                            seconds=time.perf_counter() - start)
+    write_job_status(job_path, status)
+    return status
+
+def job_status(job, job_path, status, positions=None, seconds=None,
+               error=None):
+    return {"name": job["name"], "video": job["video"], "status": status,
+            "positions": positions, "seconds": seconds,
+            "output": str(job_path), "error": error, 
+            "parameters": job_parameters(job)}
+
+def count_positions(csv_path):
+    with open(csv_path, newline="") as csv_file:
+        return max(sum(1 for row in csv.reader(csv_file)) - 1, 0)
+
+def read_job_status(job_path):
+    try:
+        with open(job_path / JOB_STATUS) as status_file:
+            return json.load(status_file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def write_job_status(job_path, status):
+    # Written to a temporary file first so an interrupted write can't leave
+    # a half written status behind
+    temp_path = job_path / f"{JOB_STATUS}.tmp"
+    with open(temp_path, "w") as status_file:
+        json.dump(status, status_file, indent=2)
+    os.replace(temp_path, job_path / JOB_STATUS)
+
+def write_summary(summary, output_path):
+    with open(output_path / SUMMARY_FILES[0], "w", newline="") as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=SUMMARY_FIELDS,
+                                extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(summary)
+    with open(output_path / SUMMARY_FILES[1], "w") as json_file:
+        json.dump(summary, json_file, indent=2)
+
+def main(argv=None, prog=None) -> None:
+    parser = init_argparse(prog)
+    args = parser.parse_args(argv)
+    try:
+        summary = run_batch(args.manifest, args.outdir, args.workers,
+                            args.rerun, progress=args.progress,
+                            gray=args.gray)
+        if any(status["status"] != "done" for status in summary):
+            exit(1)
+        exit(0)
+    except Exception as err:
+        report_failure("batch", err, progress=args.progress)
+        exit(1)
@@ -0,0 +1,35 @@
+import sys, argparse, pathlib
+
+from .events import PROGRESS_FORMATS
+
+# The command line options of batch. Kept free of cv2 and numpy, so
+# phystracker can print help and reject bad arguments before importing the
+# stage.
+
+def init_argparse(prog=None) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog=prog or sys.argv[0], add_help=False,
+        usage="%(prog)s [-h] -i MANIFEST -o OUTPUT_PATH [-w WORKERS] [--rerun] [--gray] [--progress FORMAT]",
+        description="""Runs the streaming pipeline on every video in a CSV or \
+        JSON manifest with columns video, roi, scale, threshold and optionally \
+        skip, background and name. Each video gets its own output directory \
+        and summary.csv lists the result of every job. Finished jobs are \
+        skipped when the batch is run again with the same options."""
+    )
+    required = parser.add_argument_group('required arguments')
+    required.add_argument("-i", "--manifest", action="store", type=pathlib.Path,
+                          required=True, help = "CSV or JSON file listing the videos")
+    required.add_argument("-o", "--outdir", action="store", type=pathlib.Path,
+                          required=True, help = "Directory to create the job directories in")
+
+    optional = parser.add_argument_group('optional arguments')
+    optional.add_argument("-h", "--help", action="help",
+                          help="show this help message and exit")
+    optional.add_argument("-w", "--workers", action="store", type=int, default=1,
+                          help = "Number of videos processed at the same time")
+    optional.add_argument("--rerun", action="store_true",
+                          help = "Process finished jobs again instead of skipping them")
+    optional.add_argument("--gray", action="store_true",
+                          help = "Process every video as grayscale frames")
+    optional.add_argument("--progress", choices=PROGRESS_FORMATS, default="text",
+                          help = "Print progress as text or as one JSON event per line")
+    return parser
@@ -0,0 +1,100 @@
+import os, json, hashlib
+
+# Each output directory records the stages that wrote to it in this file.
+# A stage's key is a hash of everything its output depends on: the video
+# content, its parameters and the keys of the stages it reads from. When
+# the key matches and the recorded outputs are unchanged the stage is
+# skipped and the outputs are reused.
+CACHE_FILE = ".phystracker_cache.json"
+# Bump when a change to a stage alters its output for the same inputs
+CACHE_VERSION = 1
+HASH_CHUNK_SIZE = 1 << 20
+
+def read_records(path):
+    try:
+        with open(os.path.join(str(path), CACHE_FILE)) as cache_file:
+            return json.load(cache_file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def write_records(path, records):
+    cache_path = os.path.join(str(path), CACHE_FILE)
+    with open(f"{cache_path}.tmp", "w") as cache_file:
+        json.dump(records, cache_file)
+    os.replace(f"{cache_path}.tmp", cache_path)
+
+def video_fingerprint(video_path, previous=None):
+    '''SHA-256 of the video content. Hashing a large video takes a while,
+    so a previous fingerprint with the same size and modification time is
+    reused.
+
+    Parameters:
+        video_path(str): Path to the video.
+        previous(dict): Fingerprint from an earlier run, or None.
+
+    Return:
+        dict: size, mtime_ns and sha256 of the video.
+    '''
+    stat = os.stat(video_path)
+    if previous and previous.get("size") == stat.st_size \
+        and previous.get("mtime_ns") == stat.st_mtime_ns:
+        return previous
+    digest = hashlib.sha256()
+    with open(video_path, "rb") as video_file:
+        for chunk in iter(lambda: video_file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+            "sha256": digest.hexdigest()}
+
+def stage_key(stage, params, upstream=()):
+    '''Hashes a stage name, its parameters (JSON serialisable) and the keys
+    of the stages it depends on.'''
+    content = json.dumps({"stage": stage, "version": CACHE_VERSION,
+                          "params": params, "upstream": list(upstream)},
+                         sort_keys=True)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+def upstream_key(path, stage):
+    '''Key of stage's output in path, None if it wasn't recorded.'''
+    return read_records(path).get(stage, {}).get("key")
+
+def cached_result(path, stage, key):
+    '''Returns the recorded result of stage if its key matches and every
+    recorded output still exists with the same size, otherwise None.'''
+    if key is None:
+        return None
+    record = read_records(path).get(stage)
+    if record is None or record["key"] != key:
+        return None
+    for name, size in record["outputs"].items():
+        try:
+            if os.path.getsize(os.path.join(str(path), name)) != size:
+                return None
+        except OSError:
+            return None
+    return record["result"]
+
+def invalidate(path, stage):
+    '''Forgets stage's record before its outputs are rewritten, so an
+    interrupted run isn't mistaken for a complete one.'''
+    records = read_records(path)
+    if records.pop(stage, None) is not None:
+        write_records(path, records)
+
+def record_outputs(path, stage, key, outputs, result=None, **extra):
+    '''Records the outputs (paths relative to path) stage wrote for key.'''
+    records = read_records(path)
+    records[stage] = {
+        "key": key,
+        "outputs": {name: os.path.getsize(os.path.join(str(path), name))
+                    for name in outputs},
+        "result": result or {},
+        **extra,
+    }
+    write_records(path, records)
+
+def directory_files(path):
+    '''Names of the files directly in path, excluding the cache record.'''
+    with os.scandir(str(path)) as entries:
+        return sorted(entry.name for entry in entries
+                      if entry.is_file() and not entry.name.startswith(CACHE_FILE))
@@ -0,0 +1,135 @@
+import sys, json, time
+from dataclasses import dataclass, field, asdict
+from typing import ClassVar, Optional
+
+PROGRESS_FORMATS = ("text", "json")
+# Progress is sent at most this often, the frames in between are coalesced
+PROGRESS_INTERVAL = 0.1
+
+class Cancelled(BaseException):
+    '''Raised by ProgressReporter.update once the stage is cancelled. Like
+    KeyboardInterrupt it isn't an Exception, so the stages' own error
+    handling doesn't report it as a failure.'''
+
+@dataclass
+class Event:
+    stage: str
+    time: float = field(default_factory=time.time, kw_only=True)
+    kind: ClassVar[str] = "event"
+
+    def to_dict(self):
+        return {"event": self.kind, **asdict(self)}
+
+@dataclass
+class StageStarted(Event):
+    total: Optional[int] = None
+    kind: ClassVar[str] = "stage_started"
+
+@dataclass
+class Progress(Event):
+    count: int
+    total: Optional[int]
+    frames_per_second: float
+    eta_seconds: Optional[float]
+    kind: ClassVar[str] = "progress"
+
+@dataclass
+class StageFinished(Event):
+    seconds: float
+    result: dict = field(default_factory=dict)
+    kind: ClassVar[str] = "stage_finished"
+
+@dataclass
+class StageFailed(Event):
+    error: str
+    kind: ClassVar[str] = "stage_failed"
+
+@dataclass
+class StageCancelled(Event):
+    kind: ClassVar[str] = "stage_cancelled"
+
+class ProgressReporter:
+    '''Reports the progress of one stage as typed events. Each event is put
+    on queue in a list, the form the GUI's worker pool reads, and progress
+    updates closer together than interval are dropped, so a long video
+    doesn't flood the queue.
+
+    A queue with a cancelled() method is asked on every update whether the
+    stage should stop, and Cancelled is raised once it returns True.
+
+    Parameters:
+        stage(str): Name of the stage, e.g. "extract_frame".
+        queue: multiprocessing queue read by the GUI, or None.
+        progress(str): Format printed to stdout, one of PROGRESS_FORMATS,
+            or None to print nothing.
+        interval(float): Minimum seconds between progress events.
+    '''
+    def __init__(self, stage, queue=None, progress="text",
+                 interval=PROGRESS_INTERVAL):
+        if progress is not None and progress not in PROGRESS_FORMATS:
+            raise ValueError(f"Unknown progress format {progress}.")
+        self.stage = stage
+        self.queue = queue
+        self.progress = progress
+        self.interval = interval
+        self.total = None
+        self.count = 0
+        self.start_time = time.perf_counter()
+        self.last_update = None
+        self.cancelled = getattr(queue, "cancelled", None)
+
+    def start(self, total=None):
+        self.total = total
+        self.start_time = time.perf_counter()
+        self.emit(StageStarted(self.stage, total))
+
+    def update(self, count):
+        '''Records that count frames are done.'''
+        if self.cancelled is not None and self.cancelled():
+            raise Cancelled(f"{self.stage} was cancelled.")
+        self.count = count
+        now = time.perf_counter()
+        done = self.total is not None and count >= self.total
+        if not done and self.last_update is not None \
+            and now - self.last_update < self.interval:
+            return
+        self.last_update = now
+        elapsed = now - self.start_time
+        frames_per_second = count / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if self.total is not None and frames_per_second > 0:
+            eta = max(self.total - count, 0) / frames_per_second
+        self.emit(Progress(self.stage, count, self.total, frames_per_second,
+                           eta))
+
+    def finish(self, **result):
+        '''Sends the result of the stage and the time it took.'''
+        self.emit(StageFinished(self.stage,
+                                time.perf_counter() - self.start_time,
+                                result))
+
+    def fail(self, error):
+        self.emit(StageFailed(self.stage, str(error)))
+
+    def emit(self, event):
+        if self.queue is not None:
+            self.queue.put([event])
+        print_event(event, self.progress)
+
+def print_event(event, progress="text"):
+    if progress == "json":
+        print(json.dumps(event.to_dict()), flush=True)
+    elif progress == "text":
+        if isinstance(event, Progress):
+            print(f"Progress: {event.count}/{event.total}", flush=True)
+        elif isinstance(event, StageFinished):
+            print("Process successful", flush=True)
+        elif isinstance(event, StageFailed):
+            print(event.error, file=sys.stderr, flush=True)
+        elif isinstance(event, StageCancelled):
+            print("Process cancelled", file=sys.stderr, flush=True)
+
+def report_failure(stage, error, queue=None, progress="text"):
+    '''Reports an exception that ended a stage. Used by CLI entry points
+    and GUI workers, which catch the exception outside the stage.'''
+    ProgressReporter(stage, queue, progress).fail(error)
@@ -0,0 +1,71 @@
+import sys, argparse, importlib
+
+# Subcommand name, module holding its main(), module holding its
+# init_argparse() and one line of help. The options module doesn't import
+# cv2, numpy or matplotlib, so a command's --help and argument errors are
+# handled before its stage module, and the heavy imports with it, is
+# imported.
+COMMANDS = {
+    "extract_frame": ("extract_frame_cli.extract_frame",
+                      "extract_frame_cli.extract_frame_options",
+                      "Split a video into frames and average the background"),
+    "thresholding": ("thresholding_cli.thresholding",
+                     "thresholding_cli.thresholding_options",
+                     "Find the threshold separating the object from the background"),
+    "combine_images": ("combine_images_cli.combine_images",
+                       "combine_images_cli.combine_images_options",
+                       "Combine frames into a mask of the object's path"),
+    "blob_detection": ("blob_detection_cli.blob_detection",
+                       "blob_detection_cli.blob_detection_options",
+                       "Detect and circle the blobs in a mask"),
+    "get_positions": ("get_positions_cli.get_positions",
+                      "get_positions_cli.get_positions_options",
+                      "Find the object in every frame and write its positions"),
+    "generate_graph": ("generate_graph_cli.generate_graph",
+                       "generate_graph_cli.generate_graph_options",
+                       "Plot positions, velocities or accelerations"),
+    "run": ("phystracker_cli.pipeline",
+            "phystracker_cli.pipeline_options",
+            "Stream a video through every stage in one decode pass"),
+    "batch": ("phystracker_cli.batch",
+              "phystracker_cli.batch_options",
+              "Run the pipeline on every video listed in a manifest"),
+    "benchmark": ("benchmark_cli.benchmark",
+                  "benchmark_cli.benchmark_options",
+                  "Time every stage on a synthetic video"),
+}
+
+def init_argparse() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog=sys.argv[0],
+        usage="%(prog)s [-h] [-v] COMMAND ...", add_help=False,
+        description="""Video analysis pipeline for tracking an object's path. \
+        Run %(prog)s COMMAND -h for the options of a command."""
+    )
+
+    optional = parser.add_argument_group('optional arguments')
+    optional.add_argument("-h", "--help", action="help",
+                          help="show this help message and exit")
+    optional.add_argument("-v", "--version", action="version",
+                        version=f"{parser.prog} version 1.0.0")
+
+    # Only the command name is parsed here, its arguments are parsed by the
+    # command's own parser
+    commands = parser.add_subparsers(title="commands", dest="command",
+                                     metavar="COMMAND", required=True)
+    for name, (_, _, description) in COMMANDS.items():
+        commands.add_parser(name, help=description, add_help=False)
+    return parser
+
+def main(argv=None) -> None:
+    argv = sys.argv[1:] if argv is None else argv
+    parser = init_argparse()
+    args = parser.parse_args(argv[:1])
+    module_name, options_name, _ = COMMANDS[args.command]
+    prog = f"{parser.prog} {args.command}"
+    # --help and argument errors exit here, before the stage is imported
+    importlib.import_module(options_name).init_argparse(prog).parse_args(
+        argv[1:])
+    importlib.import_module(module_name).main(argv[1:], prog=prog)
+
+if __name__ == "__main__":
+    main()
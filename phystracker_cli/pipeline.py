@@ -0,0 +1,241 @@
+import os, tempfile
+import cv2
+import numpy as np
+
+from combine_images_cli.combine_images import MaskAccumulator, is_dir_empty
+from .cache import (cached_result, invalidate, read_records, record_outputs,
+                    stage_key, video_fingerprint)
+from .events import ProgressReporter, report_failure
+from .pipeline_options import init_argparse
+from extract_frame_cli.background import (DEFAULT_ALPHA, DEFAULT_SAMPLES,
+                                          create_background_model)
+from extract_frame_cli.frame_store import frame_times, gray_frame
+from get_positions_cli.get_positions import (ROI_MARGIN, crop_to_window,
+                                             detect_position_in_window,
+                                             roi_window,
+                                             setup_position_detector,
+                                             POSITION_FILE)
+from get_positions_cli.trajectory import (DEFAULT_FORMATS,
+                                          trajectory_array, write_trajectory)
+
+class PipelineException(Exception):
+    pass
+
+class WindowSpill:
+    '''Cropped frames kept until the mean background is known. They are
+    appended to a temporary file and read back one at a time, so memory
+    doesn't grow with the length of the video.'''
+    def __init__(self):
+        self.file = tempfile.TemporaryFile()
+        self.counts = []
+        self.shape = None
+        self.dtype = None
+
+    def append(self, count, image):
+        if self.shape is None:
+            self.shape = image.shape
+            self.dtype = image.dtype
+        self.file.write(np.ascontiguousarray(image).data)
+        self.counts.append(count)
+
+    def __iter__(self):
+        self.file.seek(0)
+        for count in self.counts:
+            window = np.empty(self.shape, dtype=self.dtype)
+            self.file.readinto(window.data)
+            yield count, window
+
+    def close(self):
+        self.file.close()
+
+def read_frames(video, gray=False, timestamps=None):
+    count = 0
+    while True:
+        read_success, image = video.read()
+        if not read_success:
+            break
+        if timestamps is not None:
+            timestamps.append(video.get(cv2.CAP_PROP_POS_MSEC))
+        yield count, gray_frame(image) if gray else image
+        count += 1
+
+def update_background(frames, background):
+    # Updated once the frame has been through the rest of the pipeline, so
+    # the ema background a frame is compared with doesn't include it yet
+    for count, image in frames:
+        yield count, image
+        background.update(image)
+
+def skip_frames(frames, frame_skip):
+    for count, image in frames:
+        if count % frame_skip == 0:
+            yield count, image
+
+def accumulate_mask(frames, accumulator):
+    for count, image in frames:
+        accumulator.add_frame(image)
+        yield count, image
+
+def crop_frames(frames, window):
+    for count, image in frames:
+        yield count, crop_to_window(image, window)
+
+def detect_positions(frames, background, window, roi, detector):
+    '''Detects the object in each cropped frame against the current
+    background, yielding its position in full frame coordinates.'''
+    for count, image in frames:
+        background_window = crop_to_window(background.get(), window)
+        yield count, detect_position_in_window(image, background_window,
+                                               window, roi, detector)
+
+def run_pipeline(video_path, output_path, threshold, roi, scale,
+                 frame_skip=1, force_flag=False, queue=None, background="mean",
+                 samples=DEFAULT_SAMPLES, alpha=DEFAULT_ALPHA, 
+                 progress="text", cache=True, detector_type="blob",
+                 formats=DEFAULT_FORMATS, gray=False):
+    '''Runs every processing stage on a single decode pass of the video and
+    writes mask.png and the positions (position_data.csv and the other
+    formats requested) to the output path. No
+    intermediate frames are written to disk.
+
+    Parameters:
+        video_path(Path): Path to video.
+        output_path(Path): Path to output dir.
+        threshold(int): Threshold value calculated by threshold tool.
+        roi(tuple): Region of interest (x, y, w, h).
+        scale(float): Meter per pixel conversion factor.
+        frame_skip(int): Interval of frames to process.
+        background(str): Background model, see extract_frame.
+        progress(str): Progress printed to stdout, see ProgressReporter.
+        cache(bool): Skip the run when output_path holds results of the
+            same video and options, see cache.
+        detector_type(str): Blob detector backend, see blob_detection.
+        formats(tuple): Position file formats, see get_positions.
+        gray(bool): Convert frames to single channel as they are decoded,
+            so the background, differences and mask are all single channel.
+
+    Return:
+        float: Duration between processed frames in seconds.
+    '''
+    input_abs_path = str(video_path.resolve())
+    output_abs_path = str(output_path.resolve())
+    if not input_abs_path.endswith(".mp4"):
+        raise ValueError("Input is not an mp4 file.")
+
+    reporter = ProgressReporter("run", queue, progress)
+    key = None
+    if cache:
+        previous = read_records(output_abs_path).get("run", {})
+        fingerprint = video_fingerprint(input_abs_path, previous.get("video"))
+        key = stage_key("run", {
+            "video": fingerprint["sha256"], "threshold": threshold, 
+            "roi": list(roi), "scale": scale, "frame_skip": frame_skip, 
+            "background": background, "samples": samples, "alpha": alpha,
+            "detector": detector_type, "formats": sorted(formats), 
+            "gray": gray})
+        result = cached_result(output_abs_path, "run", key)
+        if result is not None:
+            reporter.start()
+            reporter.finish(cached=True, **result)
+            return result["frame_delta_t"]
+
+    if os.path.exists(output_abs_path):
+        if not force_flag and not is_dir_empty(output_abs_path):
+            raise IOError(f"Files already exist in {output_abs_path}.")
+    else:
+        raise FileNotFoundError(f"{output_abs_path} does not exist.")
+    invalidate(output_abs_path, "run")
+
+    vid = cv2.VideoCapture(input_abs_path)
+    fps = vid.get(cv2.CAP_PROP_FPS)
+    total_frame_count = int(vid.get(cv2.CAP_PROP_FRAME_COUNT)) - 1
+    width = int(vid.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(vid.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    if fps <= 0 or width <= 0 or height <= 0:
+        raise PipelineException(f"Unable to read any frames from {input_abs_path}.")
+    frame_delta_t = frame_skip/fps
+
+    window = roi_window(roi, (height, width), ROI_MARGIN)
+    background_model = create_background_model(background, 
+                                                video_path=input_abs_path,
+                                                samples=samples, alpha=alpha,
+                                                gray=gray)
+    accumulator = MaskAccumulator(threshold)
+    detector = setup_position_detector(detector_type)
+    reporter.start(total_frame_count + 1)
+    timestamps = []
+    frames = read_frames(vid, gray, timestamps)
+    frames = update_background(frames, background_model)
+    frames = skip_frames(frames, frame_skip)
+    frames = accumulate_mask(frames, accumulator)
+    frames = crop_frames(frames, window)
+
+    positions = []
+    counts = []
+    windows = WindowSpill() if background == "mean" else None
+    try:
+        if windows is not None:
+            # The mean is only known once every frame is read, so the region
+            # around the ROI is spilled to disk from each frame until then.
+            for count, image in frames:
+                windows.append(count, image)
+                reporter.update(count + 1)
+        else:
+            for count, position in detect_positions(frames, background_model,
+                                                    window, roi, detector):
+                counts.append(count)
+                positions.append(position)
+                reporter.update(count + 1)
+        vid.release()
+        if accumulator.previous is None:
+            raise PipelineException(f"Unable to read any frames from {input_abs_path}.")
+        if windows is not None:
+            for count, position in detect_positions(windows, background_model, 
+                                                    window, roi, detector):
+                counts.append(count)
+                positions.append(position)
+    finally:
+        if windows is not None:
+            windows.close()
+
+    # Positions are timed by their own frame's timestamp, so frames where
+    # nothing was detected don't shift the later times
+    times = frame_times(timestamps, 1 / fps, len(timestamps))
+    detected = [count for count, position in zip(counts, positions) 
+                if position is not None]
+    found = np.array([position for position in positions 
+                      if position is not None], dtype=float).reshape(-1, 2)
+    trajectory = trajectory_array(
+        Time=times[detected], x=found[:, 0] * scale,
+        y=(height - found[:, 1]) * scale)
+
+    cv2.imwrite(f"{output_abs_path}{os.sep}mask.png", accumulator.result())
+    written = write_trajectory(trajectory, output_abs_path, POSITION_FILE,
+                               formats)
+    result = {"frame_delta_t": frame_delta_t, "positions": len(trajectory),
+              "files": [f"{output_abs_path}{os.sep}{name}" for name in written]}
+    if "csv" in formats:
+        result["csv"] = f"{output_abs_path}{os.sep}{POSITION_FILE}.csv"
+    if key is not None:
+        record_outputs(output_abs_path, "run", key, ["mask.png", *written],
+                       result, video=fingerprint)
+    reporter.finish(**result)
+    return frame_delta_t
+
+def main(argv=None, prog=None) -> None:
+    parser = init_argparse(prog)
+    args = parser.parse_args(argv)
+    try:
+        frame_delta_t = run_pipeline(args.infile, args.outdir, args.threshold,
+                                     args.roi, args.meter_per_pixel, args.skip,
+                                     args.force, background=args.background,
+                                     samples=args.samples, alpha=args.alpha,
+                                     progress=args.progress, cache=args.cache,
+                                     detector_type=args.detector,
+                                     formats=args.formats, gray=args.gray)
+        if args.progress == "text":
+            print(f"frame_delta_t = {frame_delta_t}")
+        exit(0)
+    except Exception as err:
+        report_failure("run", err, progress=args.progress)
+        exit(1)
@@ -0,0 +1,72 @@
+import sys, argparse, pathlib
+
+from blob_detection_cli.blob_detection_options import DETECTORS
+from extract_frame_cli.extract_frame_options import (BACKGROUND_MODELS, 
+                                                     DEFAULT_ALPHA, 
+                                                     DEFAULT_SAMPLES)
+from get_positions_cli.get_positions_options import (DEFAULT_FORMATS,
+                                                     TRAJECTORY_FORMATS)
+from .events import PROGRESS_FORMATS
+
+# The command line options of run. Kept free of cv2 and numpy, so
+# phystracker can print help and reject bad arguments before importing the
+# stage.
+
+def tuple_type(strings):
+    strings = strings.replace("(", "").replace(")", "")
+    mapped_int = map(int, strings.split(","))
+    return tuple(mapped_int)
+
+def init_argparse(prog=None) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog=prog or sys.argv[0], add_help=False,
+        usage="%(prog)s [-h] -i INPUT_PATH -o OUTPUT_PATH -t THRESHOLD -r ROI -m M_PER_PIXEL [-s SKIP_NUM] [-f] [-b MODEL] [--detector TYPE] [--format FORMAT ...] [--gray] [--progress FORMAT] [--no-cache]",
+        description="""Streams a video through background averaging, mask \
+        combining and position detection without writing frames to disk. \
+        Outputs mask.png and position_data in the chosen formats."""
+    )
+    required = parser.add_argument_group('required arguments')
+    required.add_argument("-i", "--infile", action="store", type=pathlib.Path,
+                          required=True, help = "Full path to an mp4 file")
+    required.add_argument("-o", "--outdir", action="store", type=pathlib.Path,
+                          required=True, help = "Directory to store final results")
+    required.add_argument("-t", "--threshold", action="store", type=int,
+                          required=True, help = "Threshold value calculated by threshold tool")
+    required.add_argument("-r", "--roi", action="store", type=tuple_type,
+                          required=True, help = "Region of interest coordinates as tuple (x,y,w,h)")
+    required.add_argument("-m", "--meter_per_pixel", action="store", type=float,
+                          required=True, help = "Meter per pixel conversion factor")
+
+    optional = parser.add_argument_group('optional arguments')
+    optional.add_argument("-h", "--help", action="help",
+                          help="show this help message and exit")
+    optional.add_argument("-s", "--skip", action="store", default="1", type=int,
+                          help = "Choose interval of frames to process.")
+    optional.add_argument("-f", "--force", action=argparse.BooleanOptionalAction, \
+                        type=bool, help = """Force writes to directory with pre-existing files \
+                    and overwrites old files.""")
+    optional.add_argument("-b", "--background", choices=BACKGROUND_MODELS,
+                          default="mean", help = """Background model. median \
+                              and ema are known up front, so positions are \
+                              found while streaming without buffering the ROI""")
+    optional.add_argument("--samples", action="store", type=int,
+                          default=DEFAULT_SAMPLES,
+                          help = "Frames sampled for the median and ema background")
+    optional.add_argument("--alpha", action="store", type=float,
+                          default=DEFAULT_ALPHA,
+                          help = "Weight of each frame in the ema background")
+    optional.add_argument("--detector", choices=DETECTORS, default="blob",
+                          help = """Blob detector: OpenCV's SimpleBlobDetector \
+                              or a faster connected components detector""")
+    optional.add_argument("--format", dest="formats", nargs="+",
+                          choices=TRAJECTORY_FORMATS, default=list(DEFAULT_FORMATS),
+                          help = """Formats the positions are written in: csv, npy \
+                          (NumPy structured array) and parquet (needs pyarrow)""")
+    optional.add_argument("--gray", action="store_true",
+                          help = """Convert frames to grayscale as they are decoded \
+                          and process single channel images throughout""")
+    optional.add_argument("--progress", choices=PROGRESS_FORMATS, default="text",
+                          help = "Print progress as text or as one JSON event per line")
+    optional.add_argument("--no-cache", dest="cache", action="store_false",
+                          help = """Run again even if the output directory \
+                              holds results of the same video and options""")
+    return parser
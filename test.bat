@@ -1,13 +1,19 @@
-rem Example Workflow
-py extract_frame.py -i "..\example2\video\Bouncing ball reference.mp4" -o "..\example2\empty_frames" -f
-py thresholding.py -p1 "..\example2\frames\00002.jpg" -p2 "..\example2\frames\00004.jpg" -x (180,230) -y (90,140)
-py combine_images.py -i "..\example2\empty_frames" -o "..\example2\frames" -t 15
-py blob_detection.py -i "..\example2\empty_frames\mask\mask.png" -o "..\example2\empty_frames\mask" -r (164,57,1023,663)
-py get_positions.py -i "..\example2\testing_frames" -d 0.041666666666666664 -r (164,57,1023,663) -m 0.02
-py generate_graph.py -i "..\example2\empty_frames\data\position_data.csv" -t "y_acceleration"
+rem Example Workflow, run from the repository root
+py -m phystracker_cli extract_frame -i "example2\video\Bouncing ball reference.mp4" -o "example2\empty_frames" -f
+py -m phystracker_cli thresholding -p1 "example2\frames\00002.jpg" -p2 "example2\frames\00004.jpg" -x (180,230) -y (90,140)
+py -m phystracker_cli combine_images -i "example2\empty_frames" -o "example2\frames" -t 15
+py -m phystracker_cli blob_detection -i "example2\empty_frames\mask\mask.png" -o "example2\empty_frames\mask" -r (164,57,1023,663)
+py -m phystracker_cli get_positions -i "example2\testing_frames" -d 0.041666666666666664 -r (164,57,1023,663) -m 0.02
+py -m phystracker_cli generate_graph -i "example2\empty_frames\data\position_data.csv" -t "y_acceleration"
 
 rem Testing for extract_frame CLI
-py extract_frame.py -i "..\example2\video\fake.mp4" -o "..\example2\empty_frames" rem Invalid input file
-py extract_frame.py -i "..\example2\video\Bouncing ball reference.mp4" -o "..\example2\zxczxczx" rem Invalid output path
-py extract_frame.py -i "..\example2\video\Bouncing ball reference.mp4" -o "..\example2\frames" rem Normal use of the cli
-py extract_frame.py -i "..\example2\video\Bouncing ball reference.mp4" -o "..\example2\nonempty_frames" -f rem Check if force works when output dir is not empty
\ No newline at end of file
+py -m phystracker_cli extract_frame -i "example2\video\fake.mp4" -o "example2\empty_frames" rem Invalid input file
+py -m phystracker_cli extract_frame -i "example2\video\Bouncing ball reference.mp4" -o "example2\zxczxczx" rem Invalid output path
+py -m phystracker_cli extract_frame -i "example2\video\Bouncing ball reference.mp4" -o "example2\frames" rem Normal use of the cli
+py -m phystracker_cli extract_frame -i "example2\video\Bouncing ball reference.mp4" -o "example2\nonempty_frames" -f rem Check if force works when output dir is not empty
+
+rem Streaming workflow (single decode pass, no intermediate frames)
+py -m phystracker_cli run -i "example2\video\Bouncing ball reference.mp4" -o "example2\results" -t 15 -r (164,57,1023,663) -m 0.02
+
+rem Batch processing, manifest columns: video,roi,scale,threshold[,skip,background,name]
+py -m phystracker_cli batch -i "example2\manifest.csv" -o "example2\batch_results" -w 4
@@ -1,84 +1,105 @@
-import sys, pathlib, cv2, argparse, math
+import cv2, math
+import numpy as np
+
+from phystracker_cli.events import ProgressReporter, report_failure
+from thresholding_cli.thresholding_options import init_argparse
 
 class ThresholdingException(Exception):
     pass
 
 def calculate_threshold(image1_path, image2_path, 
-                        dimensionX=None, dimensionY=None, queue=None):
+                        dimensionX=None, dimensionY=None, queue=None,
+                        regions=None, percentile=95, progress="text"):
     input_path1 = str(image1_path.resolve())
     img1 = cv2.imread(input_path1, cv2.IMREAD_GRAYSCALE)
 
     input_path2 = str(image2_path.resolve())
     img2 = cv2.imread(input_path2, cv2.IMREAD_GRAYSCALE)
 
-    if dimensionX and dimensionY:
-        col_start, col_end = dimensionX
-        row_start, row_end = dimensionY
-    else:
-        x, y, w, h = cv2.selectROI(img1)
-        cv2.destroyAllWindows()
-        col_start = x
-        col_end = x + w
-        row_start = y
-        row_end = y + h
-
-    if col_end - col_start == 0 or row_end - row_start == 0:
-        raise ThresholdingException("Invalid region select again")
-    differences = []
-    for column in range(min(col_start, col_end), max(col_start, col_end)):
-        for row in range(min(row_start, row_end), max(row_start, row_end)):
-            first_frame_area = int(img1[row][column])
-            second_frame_area = int(img2[row][column])
-            diff = abs(first_frame_area - second_frame_area)
-            differences.append(diff)
-    threshold = math.ceil(sum(differences)/len(differences))
-    print(f"Threshold Amount: {threshold}")
-    if queue is not None:
-        queue.put(f"Threshold Amount: {threshold}")
+    if regions is None:
+        if dimensionX and dimensionY:
+            regions = [(dimensionX, dimensionY)]
+        else:
+            x, y, w, h = cv2.selectROI(img1)
+            cv2.destroyAllWindows()
+            regions = [((x, x + w), (y, y + h))]
+
+    reporter = ProgressReporter("calculate_threshold", queue, progress)
+    reporter.start()
+    threshold, stats = threshold_from_images(img1, img2, regions, percentile)
+    if progress == "text":
+        print(f"Threshold Amount: {threshold}")
+        print(f"Mean: {stats['mean']:.3f}, Median: {stats['median']:.3f}, "
+              f"{percentile}th percentile: {stats['percentile']:.3f}, "
+              f"Std: {stats['std']:.3f}")
+    reporter.finish(threshold=threshold, stats=stats)
     return threshold
 
-def init_argparse() -> argparse.ArgumentParser:
-    parser = argparse.ArgumentParser(prog=sys.argv[0],
-         usage="%(prog)s [-h] [-v] -p1 PATH1 -p2 PATH2 [-x X_TUPLE -y Y_TUPLE]", 
-         add_help=False,
-        description="Calculates threshold value used in combine_images based off regions of 2 frames. Note: Both -x and -y must be provided together or not at all."
-    )
-
-    required = parser.add_argument_group('required arguments')
-    required.add_argument("-p1", "--path1", action="store", type=pathlib.Path, required=True,
-        help = "Full path to first frame")
-    required.add_argument("-p2", "--path2", action="store", type=pathlib.Path, required=True,
-        help = "Full path to second frame")
-    
-    optional = parser.add_argument_group('optional arguments')
-    optional.add_argument("-h", "--help", action="help", 
-                          help="show this help message and exit")
-    optional.add_argument("-v", "--version", action="version", 
-                        version=f"{parser.prog} version 1.0.0")
-    optional.add_argument("-x", "--dimensionX", type=tuple_type, 
-                        help = "X dimensions used in calculation (format: '(x1,x2)')")
-    optional.add_argument("-y", "--dimensionY", type=tuple_type,
-                        help = "Y dimensions used in calculation (format: '(y1,y2)')")
-    return parser
-
-def tuple_type(strings):
-    strings = strings.replace("(", "").replace(")", "")
-    mapped_int = map(int, strings.split(","))
-    return tuple(mapped_int)
-
-def main() -> None:
-    parser = init_argparse()
-    args = parser.parse_args()
-
-    if (args.dimensionX is None) != (args.dimensionY is None):
-        parser.error("Both --dimension1 and --dimension2 must be provided together or not at all.")
-        
+def threshold_from_images(img1, img2, regions, percentile=95):
+    '''Calculates the threshold from the mean difference between two
+    grayscale images.
+
+    Return:
+        tuple: Threshold value and the statistics from region_statistics.
+    '''
+    stats = region_statistics(img1, img2, regions, percentile)
+    return math.ceil(stats["mean"]), stats
+
+def region_statistics(img1, img2, regions, percentile=95):
+    '''Describes the absolute difference between two grayscale images
+    over one or more regions.
+
+    Parameters:
+        img1(ndarray): First grayscale image.
+        img2(ndarray): Second grayscale image.
+        regions(list): Regions as ((x1, x2), (y1, y2)) pairs.
+        percentile(float): Percentile of the difference to report.
+
+    Return:
+        dict: mean, median, percentile, std and count of the differences
+        of all regions combined, and the same values for each region
+        under "regions".
+    '''
+    differences = []
+    for dimensionX, dimensionY in regions:
+        col_start, col_end = sorted(dimensionX)
+        row_start, row_end = sorted(dimensionY)
+        if col_end - col_start == 0 or row_end - row_start == 0:
+            raise ThresholdingException("Invalid region select again")
+        area1 = img1[row_start:row_end, col_start:col_end]
+        area2 = img2[row_start:row_end, col_start:col_end]
+        differences.append(cv2.absdiff(area1, area2).ravel())
+
+    stats = describe_differences(np.concatenate(differences), percentile)
+    stats["regions"] = [describe_differences(diff, percentile) 
+                        for diff in differences]
+    return stats
+
+def describe_differences(differences, percentile):
+    return {
+        "mean": differences.sum(dtype=np.int64) / differences.size,
+        "median": float(np.median(differences)),
+        "percentile": float(np.percentile(differences, percentile)),
+        "std": float(differences.std()),
+        "count": int(differences.size),
+    }
+
+def main(argv=None, prog=None) -> None:
+    parser = init_argparse(prog)
+    args = parser.parse_args(argv)
+
+    if len(args.dimensionX or []) != len(args.dimensionY or []):
+        parser.error("Both --dimensionX and --dimensionY must be provided together or not at all.")
+
+    regions = None
+    if args.dimensionX:
+        regions = list(zip(args.dimensionX, args.dimensionY))
     try:
-        calculate_threshold(args.path1, args.path2, args.dimensionX, 
-                            args.dimensionY)
+        calculate_threshold(args.path1, args.path2, regions=regions, 
+                            percentile=args.percentile, progress=args.progress)
         exit(0)
     except Exception as err:
-        print(err, file=sys.stderr)
+        report_failure("calculate_threshold", err, progress=args.progress)
         exit(1)
 
 if __name__ == "__main__":
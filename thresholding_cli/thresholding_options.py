@@ -0,0 +1,40 @@
+import sys, argparse, pathlib
+
+from phystracker_cli.events import PROGRESS_FORMATS
+
+# The command line options of thresholding. Kept free of cv2 and numpy, so
+# phystracker can print help and reject bad arguments before importing the
+# stage.
+
+def init_argparse(prog=None) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog=prog or sys.argv[0],
+         usage="%(prog)s [-h] [-v] -p1 PATH1 -p2 PATH2 [-x X_TUPLE -y Y_TUPLE ...] [-q PERCENTILE] [--progress FORMAT]", 
+         add_help=False,
+        description="Calculates threshold value used in combine_images based off regions of 2 frames. Note: Both -x and -y must be provided together or not at all, and may be repeated to combine several regions."
+    )
+
+    required = parser.add_argument_group('required arguments')
+    required.add_argument("-p1", "--path1", action="store", type=pathlib.Path, required=True,
+        help = "Full path to first frame")
+    required.add_argument("-p2", "--path2", action="store", type=pathlib.Path, required=True,
+        help = "Full path to second frame")
+    
+    optional = parser.add_argument_group('optional arguments')
+    optional.add_argument("-h", "--help", action="help", 
+                          help="show this help message and exit")
+    optional.add_argument("-v", "--version", action="version", 
+                        version=f"{parser.prog} version 1.0.0")
+    optional.add_argument("-x", "--dimensionX", type=tuple_type, action="append",
+                        help = "X dimensions used in calculation (format: '(x1,x2)')")
+    optional.add_argument("-y", "--dimensionY", type=tuple_type, action="append",
+                        help = "Y dimensions used in calculation (format: '(y1,y2)')")
+    optional.add_argument("-q", "--percentile", type=float, default=95,
+                        help = "Percentile of the difference to report")
+    optional.add_argument("--progress", choices=PROGRESS_FORMATS, default="text",
+                          help = "Print the result as text or as one JSON event per line")
+    return parser
+
+def tuple_type(strings):
+    strings = strings.replace("(", "").replace(")", "")
+    mapped_int = map(int, strings.split(","))
+    return tuple(mapped_int)